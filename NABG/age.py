@@ -0,0 +1,59 @@
+import re
+import time
+from typing import Optional
+
+# Milliseconds from the Unix epoch to the start of 2015, where Discord IDs count from
+DISCORD_EPOCH = 1420070400000
+
+AGE_PATTERN = re.compile(r"(\d+)\s*([hd]?)", re.IGNORECASE)
+
+
+def snowflake_cutoff(max_age_hours: int, now: Optional[float] = None) -> int:
+    """
+    The smallest snowflake an account younger than `max_age_hours` can have.
+
+    IDs encode their creation time in the top 42 bits, so an account is too new
+    exactly when its ID is at or above this.
+    """
+    if now is None:
+        now = time.time()
+    created_ms = int(now * 1000) - max_age_hours * 3600 * 1000
+    return max(created_ms + 1 - DISCORD_EPOCH, 0) << 22
+
+
+def snowflake_age(snowflake: int, now: Optional[float] = None) -> float:
+    """Seconds since a snowflake was created"""
+    if now is None:
+        now = time.time()
+    return now - ((snowflake >> 22) + DISCORD_EPOCH) / 1000
+
+
+def parse_age(value: str) -> Optional[int]:
+    """Hours in an age such as "72h", "3d" or "48"; None if it can't be read"""
+    match = AGE_PATTERN.fullmatch(value.strip())
+    if match is None:
+        return None
+    amount = int(match.group(1))
+    return amount * 24 if match.group(2).lower() == "d" else amount
+
+
+def format_hours(hours: int) -> str:
+    if hours % 24 == 0:
+        days = hours // 24
+        return f"{days} day{'s' if days != 1 else ''}"
+    return f"{hours} hour{'s' if hours != 1 else ''}"
+
+
+def format_age(seconds: float) -> str:
+    """An age like "3d 4h 12m 5s" """
+    seconds = max(int(seconds), 0)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    parts = [f"{days}d"] if days else []
+    if days or hours:
+        parts.append(f"{hours}h")
+    if days or hours or minutes:
+        parts.append(f"{minutes}m")
+    parts.append(f"{seconds}s")
+    return " ".join(parts)
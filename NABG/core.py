@@ -2,33 +2,129 @@ import discord
 from redbot.core import commands, Config, checks
 from redbot.core.bot import Red
 from datetime import datetime, timezone
+from typing import Dict, List
+import asyncio
+import io
 import logging
+import time
+
+from .age import format_age, format_hours, parse_age, snowflake_age, snowflake_cutoff
+from .digest import EMBEDS_PER_MESSAGE, LogDigest, events_csv, events_table
+from .pipeline import DM_SKIP_DEPTH, DM_TIMEOUT, KICK, LOG, MAX_BACKLOG, ActionPipeline
+from .raid import MAX_WINDOW, RaidDetector
 
 log = logging.getLogger("red.nabg")
 
+# Seconds between recomputing the account-age cutoffs; a check can be this far off
+CUTOFF_REFRESH = 30
+
 class NABG(commands.Cog):
-    """New Accounts Be Gone - Automatically kicks accounts created today"""
+    """New Accounts Be Gone - Automatically kicks accounts younger than a set age"""
     
     def __init__(self, bot: Red):
         self.bot = bot
         self.config = Config.get_conf(self, identifier=1234567890)
         
         # Default guild settings
-        default_guild = {
+        self.default_guild = {
             "enabled": False,
             "log_channel": None,
-            "kick_message": "Your account was created too recently to join this server."
+            "kick_message": "Your account was created too recently to join this server.",
+            # How many kicks may run at once in the guild
+            "workers": 2,
+            # Accounts younger than this are kicked
+            "min_age_hours": 24,
+            # Raid mode: this many joins within raid_window seconds, with at least
+            # raid_young_percent of them younger than raid_min_age_hours, raises the
+            # minimum age to raid_min_age_hours for raid_minutes after the last such join
+            "raid_enabled": False,
+            "raid_joins": 15,
+            "raid_window": 30,
+            "raid_young_percent": 50,
+            "raid_min_age_hours": 168,
+            "raid_minutes": 10
         }
         
-        self.config.register_guild(**default_guild)
+        self.config.register_guild(**self.default_guild)
+
+        # Guild ID -> settings, so joins never wait on Config
+        self.settings: Dict[int, dict] = {}
+        # Guild ID -> whether the bot can kick there, dropped whenever roles or the guild change
+        self.can_kick: Dict[int, bool] = {}
+        # Minimum age in hours -> lowest snowflake of an account that is too new
+        self.cutoffs: Dict[int, int] = {}
+        # Guild ID -> join-burst detector, made on the first join once raid mode is enabled
+        self.raids: Dict[int, RaidDetector] = {}
+        self._cutoff_task = None
+
+        self.pipeline = ActionPipeline()
+        self.digest = LogDigest(self._queue_log)
+
+    async def cog_load(self):
+        self.settings = await self.config.all_guilds()
+        self._refresh_cutoffs()
+        self._cutoff_task = asyncio.create_task(self._cutoff_loop())
+
+    async def cog_unload(self):
+        if self._cutoff_task:
+            self._cutoff_task.cancel()
+        # Queue what is still buffered, then let the pipeline send every queued log
+        self.digest.flush_all()
+        await self.pipeline.close()
+        # Kicks that were already running finish during the close and log afterwards
+        self.digest.flush_all()
+        await self.pipeline.close()
+
+    def _settings(self, guild: discord.Guild) -> dict:
+        """Cached settings for a guild"""
+        return self.settings.get(guild.id, self.default_guild)
+
+    async def _refresh_settings(self, guild: discord.Guild):
+        """Reload a guild's cached settings after they change"""
+        self.settings[guild.id] = await self.config.guild(guild).all()
+        self._refresh_cutoffs()
+
+    def _refresh_cutoffs(self):
+        """Recompute the snowflake cutoff for every minimum age in use"""
+        ages = {self.default_guild["min_age_hours"], self.default_guild["raid_min_age_hours"]}
+        for settings in self.settings.values():
+            ages.update((settings["min_age_hours"], settings["raid_min_age_hours"]))
+        self.cutoffs = {hours: snowflake_cutoff(hours) for hours in ages}
+
+    async def _cutoff_loop(self):
+        while True:
+            await asyncio.sleep(CUTOFF_REFRESH)
+            self._refresh_cutoffs()
+
+    def _is_too_new(self, user: discord.abc.User, hours: int) -> bool:
+        """Whether an account is younger than `hours`; one integer comparison"""
+        return user.id >= self.cutoffs[hours]
+
+    def _in_raid_mode(self, guild: discord.Guild) -> bool:
+        detector = self.raids.get(guild.id)
+        return detector is not None and detector.active(time.monotonic())
+
+    def _min_age(self, guild: discord.Guild, settings: dict) -> int:
+        """The minimum account age in force, in hours; raid mode can only raise it"""
+        if settings["raid_enabled"] and self._in_raid_mode(guild):
+            return max(settings["min_age_hours"], settings["raid_min_age_hours"])
+        return settings["min_age_hours"]
+
+    def _can_kick(self, guild: discord.Guild) -> bool:
+        """Cached check for the bot's kick permission in a guild"""
+        can_kick = self.can_kick.get(guild.id)
+        if can_kick is None:
+            can_kick = self.can_kick[guild.id] = guild.me.guild_permissions.kick_members
+        return can_kick
     
     @commands.group(name="nabg", invoke_without_command=True)
     @checks.admin_or_permissions(manage_guild=True)
     async def nabg_group(self, ctx):
         """NABG - New Accounts Be Gone configuration"""
         if ctx.invoked_subcommand is None:
-            enabled = await self.config.guild(ctx.guild).enabled()
-            log_channel_id = await self.config.guild(ctx.guild).log_channel()
+            settings = self._settings(ctx.guild)
+            enabled = settings["enabled"]
+            log_channel_id = settings["log_channel"]
             log_channel = ctx.guild.get_channel(log_channel_id) if log_channel_id else None
             
             embed = discord.Embed(
@@ -48,7 +144,7 @@ class NABG(commands.Cog):
             )
             embed.add_field(
                 name="Function", 
-                value="Kicks users whose accounts were created today", 
+                value=f"Kicks users whose accounts are younger than {format_hours(settings['min_age_hours'])}", 
                 inline=False
             )
             
@@ -59,9 +155,11 @@ class NABG(commands.Cog):
     async def enable_nabg(self, ctx):
         """Enable NABG protection"""
         await self.config.guild(ctx.guild).enabled.set(True)
+        await self._refresh_settings(ctx.guild)
+        min_age = format_hours(self._settings(ctx.guild)["min_age_hours"])
         embed = discord.Embed(
             title="NABG Enabled",
-            description="✅ New account protection is now active. Users with accounts created today will be kicked.",
+            description=f"✅ New account protection is now active. Users with accounts younger than {min_age} will be kicked.",
             color=discord.Color.green()
         )
         await ctx.send(embed=embed)
@@ -72,6 +170,7 @@ class NABG(commands.Cog):
     async def disable_nabg(self, ctx):
         """Disable NABG protection"""
         await self.config.guild(ctx.guild).enabled.set(False)
+        await self._refresh_settings(ctx.guild)
         embed = discord.Embed(
             title="NABG Disabled",
             description="❌ New account protection is now inactive.",
@@ -86,9 +185,11 @@ class NABG(commands.Cog):
         """Set the channel for NABG logs"""
         if channel is None:
             await self.config.guild(ctx.guild).log_channel.set(None)
+            await self._refresh_settings(ctx.guild)
             await ctx.send("Log channel cleared.")
         else:
             await self.config.guild(ctx.guild).log_channel.set(channel.id)
+            await self._refresh_settings(ctx.guild)
             await ctx.send(f"Log channel set to {channel.mention}")
     
     @nabg_group.command(name="message")
@@ -96,8 +197,145 @@ class NABG(commands.Cog):
     async def set_kick_message(self, ctx, *, message: str):
         """Set the DM message sent to kicked users"""
         await self.config.guild(ctx.guild).kick_message.set(message)
+        await self._refresh_settings(ctx.guild)
         await ctx.send(f"Kick message updated to: {message}")
     
+    @nabg_group.command(name="minage")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def set_min_age(self, ctx, age: str):
+        """Set the minimum account age, in hours or days (e.g. 72h or 3d)"""
+        hours = parse_age(age)
+        if hours is None or not 1 <= hours <= 24 * 365:
+            await ctx.send("Give an age between 1h and 365d, like 72h or 3d.")
+            return
+        await self.config.guild(ctx.guild).min_age_hours.set(hours)
+        await self._refresh_settings(ctx.guild)
+        await ctx.send(f"Accounts younger than {format_hours(hours)} will now be kicked.")
+
+    @nabg_group.command(name="workers")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def set_workers(self, ctx, workers: int):
+        """Set how many kicks NABG runs at once (1-10)"""
+        if not 1 <= workers <= 10:
+            await ctx.send("Workers must be between 1 and 10.")
+            return
+        await self.config.guild(ctx.guild).workers.set(workers)
+        await self._refresh_settings(ctx.guild)
+        await ctx.send(f"NABG will now run up to {workers} kicks at once.")
+
+    @nabg_group.command(name="status")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def pipeline_status(self, ctx):
+        """Show the kick queue for this server"""
+        queue = self.pipeline.guilds.get(ctx.guild.id)
+        embed = discord.Embed(title="NABG Status", color=discord.Color.blue())
+        detector = self.raids.get(ctx.guild.id)
+        if self._settings(ctx.guild)["raid_enabled"] and detector is not None:
+            remaining = detector.raid_until - time.monotonic()
+            embed.add_field(name="Raid Mode", value=f"Active for {format_age(remaining)}" if remaining > 0 else "Off", inline=True)
+            joins, young_joins = detector.recent(time.monotonic())
+            embed.add_field(name="Recent Joins", value=f"{joins} ({young_joins} young)", inline=True)
+            embed.add_field(name="Raids Detected", value=detector.raids, inline=True)
+        if queue is None:
+            embed.description = "No accounts have been kicked since the cog loaded."
+        else:
+            embed.add_field(name="Queue Depth", value=f"{queue.depth}/{MAX_BACKLOG}", inline=True)
+            embed.add_field(name="Active Workers", value=f"{len(queue.workers)}/{queue.concurrency}", inline=True)
+            embed.add_field(name="Drain Rate", value=f"{queue.drain_rate():.0f}/min", inline=True)
+            embed.add_field(name="Completed", value=queue.completed, inline=True)
+            embed.add_field(name="Failed", value=queue.failed, inline=True)
+            embed.add_field(name="Dropped", value=queue.dropped, inline=True)
+        await ctx.send(embed=embed)
+    
+    @nabg_group.group(name="raid", invoke_without_command=True)
+    @checks.admin_or_permissions(manage_guild=True)
+    async def raid_group(self, ctx):
+        """Join-burst raid detection settings"""
+        if ctx.invoked_subcommand is None:
+            settings = self._settings(ctx.guild)
+            embed = discord.Embed(title="NABG Raid Detection", color=discord.Color.blue())
+            embed.add_field(name="Status", value="✅ Enabled" if settings["raid_enabled"] else "❌ Disabled", inline=True)
+            embed.add_field(name="Raid Mode", value="Active" if self._in_raid_mode(ctx.guild) else "Off", inline=True)
+            embed.add_field(
+                name="Trigger",
+                value=f"{settings['raid_joins']} joins in {settings['raid_window']}s, "
+                      f"{settings['raid_young_percent']}% younger than {format_hours(settings['raid_min_age_hours'])}",
+                inline=False
+            )
+            embed.add_field(
+                name="During a Raid",
+                value=f"Kicks accounts younger than {format_hours(settings['raid_min_age_hours'])} "
+                      f"until {settings['raid_minutes']} minutes after the burst ends",
+                inline=False
+            )
+            await ctx.send(embed=embed)
+
+    @raid_group.command(name="enable")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def enable_raid(self, ctx):
+        """Enable raid detection"""
+        await self.config.guild(ctx.guild).raid_enabled.set(True)
+        await self._refresh_settings(ctx.guild)
+        await ctx.send("Raid detection enabled.")
+
+    @raid_group.command(name="disable")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def disable_raid(self, ctx):
+        """Disable raid detection and leave raid mode"""
+        await self.config.guild(ctx.guild).raid_enabled.set(False)
+        await self._refresh_settings(ctx.guild)
+        self.raids.pop(ctx.guild.id, None)
+        await ctx.send("Raid detection disabled.")
+
+    @raid_group.command(name="threshold")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def set_raid_threshold(self, ctx, joins: int, seconds: int, young_percent: int = 50):
+        """Set how many joins within how many seconds, and what percent of them young, start raid mode"""
+        if joins < 2 or not 1 <= seconds <= MAX_WINDOW or not 0 <= young_percent <= 100:
+            await ctx.send(f"Use at least 2 joins, 1-{MAX_WINDOW} seconds and 0-100 percent.")
+            return
+        guild_config = self.config.guild(ctx.guild)
+        await guild_config.raid_joins.set(joins)
+        await guild_config.raid_window.set(seconds)
+        await guild_config.raid_young_percent.set(young_percent)
+        await self._refresh_settings(ctx.guild)
+        await ctx.send(f"Raid mode will start after {joins} joins in {seconds}s with {young_percent}% young accounts.")
+
+    @raid_group.command(name="minage")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def set_raid_min_age(self, ctx, age: str):
+        """Set which accounts count as young, and are kicked during a raid (e.g. 7d)"""
+        hours = parse_age(age)
+        if hours is None or not 1 <= hours <= 24 * 365:
+            await ctx.send("Give an age between 1h and 365d, like 72h or 7d.")
+            return
+        await self.config.guild(ctx.guild).raid_min_age_hours.set(hours)
+        await self._refresh_settings(ctx.guild)
+        await ctx.send(f"During a raid, accounts younger than {format_hours(hours)} will be kicked.")
+
+    @raid_group.command(name="duration")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def set_raid_duration(self, ctx, minutes: int):
+        """Set how many minutes raid mode lasts after the burst ends"""
+        if not 1 <= minutes <= 1440:
+            await ctx.send("Duration must be between 1 and 1440 minutes.")
+            return
+        await self.config.guild(ctx.guild).raid_minutes.set(minutes)
+        await self._refresh_settings(ctx.guild)
+        await ctx.send(f"Raid mode will last {minutes} minutes after the burst ends.")
+
+    @raid_group.command(name="end")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def end_raid(self, ctx):
+        """Leave raid mode now"""
+        detector = self.raids.get(ctx.guild.id)
+        if detector is None or not detector.active(time.monotonic()):
+            await ctx.send("Raid mode is not active.")
+            return
+        detector.end()
+        await ctx.send("Raid mode ended.")
+        log.info(f"NABG raid mode ended by {ctx.author} in guild {ctx.guild.name} ({ctx.guild.id})")
+
     @nabg_group.command(name="test")
     @checks.admin_or_permissions(manage_guild=True)
     async def test_account_age(self, ctx, user: discord.Member = None):
@@ -105,8 +343,9 @@ class NABG(commands.Cog):
         if user is None:
             user = ctx.author
         
-        created_today = self._is_account_created_today(user)
-        account_age = datetime.now(timezone.utc) - user.created_at
+        settings = self._settings(ctx.guild)
+        min_age = self._min_age(ctx.guild, settings)
+        too_new = self._is_too_new(user, min_age)
         
         embed = discord.Embed(
             title="Account Age Test",
@@ -114,34 +353,55 @@ class NABG(commands.Cog):
         )
         embed.add_field(name="User", value=user.mention, inline=True)
         embed.add_field(name="Account Created", value=user.created_at.strftime("%Y-%m-%d %H:%M:%S UTC"), inline=True)
-        embed.add_field(name="Account Age", value=f"{account_age.days} days", inline=True)
-        embed.add_field(name="Created Today?", value="Yes" if created_today else "No", inline=True)
-        embed.add_field(name="Would be kicked?", value="Yes" if created_today else "No", inline=True)
+        embed.add_field(name="Account Age", value=format_age(snowflake_age(user.id)), inline=True)
+        embed.add_field(
+            name="Minimum Age",
+            value=format_hours(min_age) + (" (raid mode)" if min_age != settings["min_age_hours"] else ""),
+            inline=True
+        )
+        embed.add_field(name="Would be kicked?", value="Yes" if too_new else "No", inline=True)
         
         await ctx.send(embed=embed)
     
-    def _is_account_created_today(self, user: discord.Member) -> bool:
-        """Check if user account was created today"""
-        now = datetime.now(timezone.utc)
-        user_created = user.created_at
-        
-        # Check if both dates are the same day
-        return (now.date() == user_created.date())
-    
-    async def _send_log(self, guild: discord.Guild, message: str):
-        """Send a message to the configured log channel"""
-        log_channel_id = await self.config.guild(guild).log_channel()
+    def _queue_log(self, guild_id: int, events: List[dict]):
+        """Queue a batch of kicks from the digest for logging behind any pending kicks"""
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return
+        # Batches are already bounded by the digest, so a full kick backlog never drops them
+        self.pipeline.submit(guild_id, LOG, lambda: self._send_log(guild, events), self._settings(guild)["workers"], capped=False)
+
+    async def _send_log(self, guild: discord.Guild, events: List[dict]):
+        """Send a batch of kicks to the configured log channel as one message"""
+        log_channel_id = self._settings(guild)["log_channel"]
         if log_channel_id:
             log_channel = guild.get_channel(log_channel_id)
             if log_channel:
                 try:
-                    embed = discord.Embed(
-                        title="NABG - Account Kicked",
-                        description=message,
-                        color=discord.Color.orange(),
-                        timestamp=datetime.now(timezone.utc)
-                    )
-                    await log_channel.send(embed=embed)
+                    if len(events) <= EMBEDS_PER_MESSAGE:
+                        embeds = [
+                            discord.Embed(
+                                title="NABG - Account Kicked",
+                                description=f"**User:** {event['user']} ({event['user_id']})\n**Account Created:** {event['created_at'].strftime('%Y-%m-%d %H:%M:%S UTC')}\n**Reason:** {event['reason']}",
+                                color=discord.Color.orange(),
+                                timestamp=event["kicked_at"]
+                            )
+                            for event in events
+                        ]
+                        await log_channel.send(embeds=embeds)
+                    else:
+                        embed = discord.Embed(
+                            title=f"NABG - {len(events)} Accounts Kicked",
+                            description=events_table(events),
+                            color=discord.Color.orange(),
+                            timestamp=events[-1]["kicked_at"]
+                        )
+                        embed.set_footer(text="Every kick is in the attached CSV")
+                        file = discord.File(
+                            io.BytesIO(events_csv(events)),
+                            filename=f"nabg-kicks-{events[0]['kicked_at']:%Y%m%d-%H%M%S}.csv"
+                        )
+                        await log_channel.send(embed=embed, file=file)
                 except discord.Forbidden:
                     log.warning(f"Cannot send to log channel {log_channel_id} in guild {guild.id}")
     
@@ -151,40 +411,116 @@ class NABG(commands.Cog):
         guild = member.guild
         
         # Check if NABG is enabled for this guild
-        enabled = await self.config.guild(guild).enabled()
-        if not enabled:
+        settings = self._settings(guild)
+        if not settings["enabled"]:
             return
         
         # Check if the bot has permission to kick members
-        if not guild.me.guild_permissions.kick_members:
+        if not self._can_kick(guild):
             log.warning(f"Bot lacks kick permissions in guild {guild.name} ({guild.id})")
             return
         
-        # Check if account was created today
-        if self._is_account_created_today(member):
+        # Count the join towards raid detection, which may raise the minimum age
+        if settings["raid_enabled"]:
+            self._record_join(member, settings)
+        min_age = self._min_age(guild, settings)
+        
+        # Check the account's age; the kick itself runs on the guild's queue
+        if self._is_too_new(member, min_age):
+            if not self.pipeline.submit(guild.id, KICK, lambda: self._kick(member, settings, min_age), settings["workers"]):
+                log.warning(f"NABG backlog full in guild {guild.name} ({guild.id}) - not kicking {member} ({member.id})")
+
+    def _record_join(self, member: discord.Member, settings: dict):
+        """Feed a join to the guild's raid detector; O(1) per join"""
+        guild = member.guild
+        detector = self.raids.get(guild.id)
+        if detector is None or detector.window != settings["raid_window"]:
+            detector = self.raids[guild.id] = RaidDetector(settings["raid_window"])
+        young = self._is_too_new(member, settings["raid_min_age_hours"])
+        now = time.monotonic()
+        if detector.record(now, young, settings["raid_joins"], settings["raid_young_percent"], settings["raid_minutes"] * 60):
+            joins, young_joins = detector.joins.total, detector.young.total
+            log.warning(f"NABG raid mode started in guild {guild.name} ({guild.id}) - {joins} joins in {detector.window}s, {young_joins} young")
+            self.pipeline.submit(guild.id, LOG, lambda: self._send_raid_alert(guild, settings, joins, young_joins), settings["workers"])
+
+    async def _send_raid_alert(self, guild: discord.Guild, settings: dict, joins: int, young: int):
+        """Tell the log channel that raid mode has started"""
+        log_channel_id = settings["log_channel"]
+        log_channel = guild.get_channel(log_channel_id) if log_channel_id else None
+        if log_channel:
+            embed = discord.Embed(
+                title="NABG - Raid Mode Started",
+                description=f"**Joins:** {joins} in {settings['raid_window']}s ({young} younger than {format_hours(settings['raid_min_age_hours'])})\n"
+                            f"**Now kicking:** accounts younger than {format_hours(max(settings['min_age_hours'], settings['raid_min_age_hours']))}\n"
+                            f"**Ends:** {settings['raid_minutes']} minutes after the joins calm down, or with *nabg raid end*",
+                color=discord.Color.red(),
+                timestamp=datetime.now(timezone.utc)
+            )
             try:
-                # Get kick message
-                kick_message = await self.config.guild(guild).kick_message()
-                
-                # Try to send DM first
+                await log_channel.send(embed=embed)
+            except discord.Forbidden:
+                log.warning(f"Cannot send to log channel {log_channel_id} in guild {guild.id}")
+
+    async def _kick(self, member: discord.Member, settings: dict, min_age: int):
+        """DM and kick a new account, then queue its log entry"""
+        guild = member.guild
+        try:
+            # Try to send DM first, unless a raid has the queue backed up
+            if self.pipeline.guilds[guild.id].depth < DM_SKIP_DEPTH:
                 try:
-                    await member.send(kick_message)
+                    await asyncio.wait_for(member.send(settings["kick_message"]), DM_TIMEOUT)
                 except discord.Forbidden:
                     log.info(f"Could not DM user {member} ({member.id}) - DMs disabled")
-                
-                # Kick the member
-                await member.kick(reason="Account created today - NABG protection")
-                
-                # Log the action
-                log_message = f"**User:** {member} ({member.id})\n**Account Created:** {member.created_at.strftime('%Y-%m-%d %H:%M:%S UTC')}\n**Reason:** Account created today"
-                await self._send_log(guild, log_message)
-                
-                log.info(f"Kicked user {member} ({member.id}) from guild {guild.name} ({guild.id}) - account created today")
-                
-            except discord.Forbidden:
-                log.warning(f"Failed to kick user {member} ({member.id}) from guild {guild.name} ({guild.id}) - insufficient permissions")
-            except Exception as e:
-                log.error(f"Error kicking user {member} ({member.id}) from guild {guild.name} ({guild.id}): {e}")
+                except (asyncio.TimeoutError, discord.HTTPException):
+                    log.info(f"Gave up on DMing user {member} ({member.id})")
+            
+            # Kick the member
+            reason = f"Account younger than {format_hours(min_age)}"
+            if min_age != settings["min_age_hours"]:
+                reason += " during a raid"
+            await member.kick(reason=f"{reason} - NABG protection")
+            
+            # Log the action with the rest of its batch
+            self.digest.add(guild.id, {
+                "user": str(member),
+                "user_id": member.id,
+                "created_at": member.created_at,
+                "kicked_at": datetime.now(timezone.utc),
+                "reason": reason
+            })
+            
+            log.info(f"Kicked user {member} ({member.id}) from guild {guild.name} ({guild.id}) - {reason.lower()}")
+            
+        except discord.Forbidden:
+            log.warning(f"Failed to kick user {member} ({member.id}) from guild {guild.name} ({guild.id}) - insufficient permissions")
+        except Exception as e:
+            log.error(f"Error kicking user {member} ({member.id}) from guild {guild.name} ({guild.id}): {e}")
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role: discord.Role):
+        self.can_kick.pop(role.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        self.can_kick.pop(role.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        self.can_kick.pop(after.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        # The bot's own roles decide its permissions
+        if after.id == self.bot.user.id:
+            self.can_kick.pop(after.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+        self.can_kick.pop(after.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.can_kick.pop(guild.id, None)
 
 async def setup(bot):
     """Setup function for the cog"""
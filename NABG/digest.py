@@ -0,0 +1,73 @@
+import asyncio
+import csv
+import io
+from typing import Callable, Dict, List
+
+# A guild's buffered kicks are logged after this many seconds...
+FLUSH_SECONDS = 10.0
+# ...or as soon as this many have piled up
+FLUSH_EVENTS = 50
+# Batches up to this size get one embed per kick; larger ones a table and a CSV
+EMBEDS_PER_MESSAGE = 10
+# Rows shown in a large batch's table
+TABLE_ROWS = 15
+
+
+class LogDigest:
+    """
+    Buffers kick events per guild and hands them over in batches.
+
+    The first event in an empty buffer starts a timer; the buffer is flushed
+    when the timer fires or when it reaches FLUSH_EVENTS, whichever is first.
+    So a raid costs one log message per batch rather than one per kick.
+    """
+
+    def __init__(self, flush: Callable[[int, List[dict]], None]):
+        self._flush = flush
+        self.buffers: Dict[int, List[dict]] = {}
+        self.timers: Dict[int, asyncio.TimerHandle] = {}
+
+    def add(self, guild_id: int, event: dict):
+        buffer = self.buffers.setdefault(guild_id, [])
+        buffer.append(event)
+        if len(buffer) >= FLUSH_EVENTS:
+            self.flush(guild_id)
+        elif guild_id not in self.timers:
+            self.timers[guild_id] = asyncio.get_running_loop().call_later(FLUSH_SECONDS, self.flush, guild_id)
+
+    def flush(self, guild_id: int):
+        timer = self.timers.pop(guild_id, None)
+        if timer is not None:
+            timer.cancel()
+        events = self.buffers.pop(guild_id, None)
+        if events:
+            self._flush(guild_id, events)
+
+    def flush_all(self):
+        """Hand over every guild's buffer now, without waiting for the timers"""
+        for guild_id in list(self.buffers):
+            self.flush(guild_id)
+
+
+def events_table(events: List[dict]) -> str:
+    """A code block listing the first TABLE_ROWS kicks"""
+    rows = [f"{'Kicked':<8} {'User ID':<20} {'Created':<16} User"]
+    for event in events[:TABLE_ROWS]:
+        user = event["user"].replace("`", "'")[:32]
+        rows.append(
+            f"{event['kicked_at']:%H:%M:%S} {event['user_id']:<20} {event['created_at']:%Y-%m-%d %H:%M} {user}"
+        )
+    return "```\n" + "\n".join(rows) + "\n```"
+
+
+def events_csv(events: List[dict]) -> bytes:
+    """Every kick in a batch as CSV"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["kicked_at", "user_id", "user", "account_created", "reason"])
+    for event in events:
+        writer.writerow([
+            event["kicked_at"].isoformat(), event["user_id"], event["user"],
+            event["created_at"].isoformat(), event["reason"],
+        ])
+    return output.getvalue().encode("utf-8")
@@ -0,0 +1,132 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Set
+
+log = logging.getLogger("red.nabg.pipeline")
+
+# Lower runs first, so kicks get ahead of log messages during a raid
+KICK = 0
+LOG = 1
+
+# Most actions a guild can have waiting before new ones are turned away
+MAX_BACKLOG = 1000
+# Seconds a kick waits on its DM before giving up on it
+DM_TIMEOUT = 3.0
+# Queue depth past which kicks skip the DM entirely
+DM_SKIP_DEPTH = 25
+# Seconds the drain rate is measured over
+RATE_WINDOW = 60
+# Seconds closing waits for queued log messages to go out
+CLOSE_TIMEOUT = 10.0
+
+Action = Callable[[], Awaitable[None]]
+
+
+class GuildQueue:
+    """One guild's waiting actions and the workers draining them"""
+
+    def __init__(self, concurrency: int):
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.concurrency = concurrency
+        self.workers: Set[asyncio.Task] = set()
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        # Finish times within the last RATE_WINDOW seconds
+        self._finished: Deque[float] = deque()
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def record_finished(self):
+        now = time.monotonic()
+        self.completed += 1
+        self._finished.append(now)
+        self._expire(now)
+
+    def _expire(self, now: float):
+        while self._finished and self._finished[0] <= now - RATE_WINDOW:
+            self._finished.popleft()
+
+    def drain_rate(self) -> float:
+        """Actions finished per minute over the last RATE_WINDOW seconds"""
+        self._expire(time.monotonic())
+        return len(self._finished) * 60 / RATE_WINDOW
+
+
+class ActionPipeline:
+    """
+    Per-guild priority queues of moderation actions with a bounded worker pool.
+
+    Join events only enqueue work and return. Each guild gets at most its
+    configured number of workers, which are started as work arrives and exit
+    once the queue is empty, so idle guilds hold no tasks.
+    """
+
+    def __init__(self):
+        self.guilds: Dict[int, GuildQueue] = {}
+        # Breaks ties so actions of the same priority run in arrival order
+        self._order = itertools.count()
+
+    def submit(self, guild_id: int, priority: int, action: Action, concurrency: int, capped: bool = True) -> bool:
+        """
+        Queue an action; False if the guild's backlog is full.
+
+        Uncapped actions are always queued, for work that is already batched
+        and bounded, such as log digests.
+        """
+        queue = self.guilds.get(guild_id)
+        if queue is None:
+            queue = self.guilds[guild_id] = GuildQueue(concurrency)
+        queue.concurrency = concurrency
+
+        if capped and queue.depth >= MAX_BACKLOG:
+            queue.dropped += 1
+            return False
+        queue.queue.put_nowait((priority, next(self._order), action))
+        self._start_workers(guild_id, queue)
+        return True
+
+    def _start_workers(self, guild_id: int, queue: GuildQueue):
+        while len(queue.workers) < min(queue.concurrency, queue.depth):
+            queue.workers.add(asyncio.create_task(self._work(guild_id, queue)))
+
+    async def _work(self, guild_id: int, queue: GuildQueue):
+        try:
+            while True:
+                try:
+                    _, _, action = queue.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await action()
+                except Exception:
+                    queue.failed += 1
+                    log.exception(f"NABG action failed in guild {guild_id}")
+                queue.record_finished()
+        finally:
+            # Dropped before yielding, so submit() never counts a worker that has stopped
+            queue.workers.discard(asyncio.current_task())
+
+    async def close(self, timeout: float = CLOSE_TIMEOUT):
+        """Drop the queued kicks, give the queued log messages `timeout` seconds to go out, then stop"""
+        for guild_id, queue in self.guilds.items():
+            waiting = []
+            while not queue.queue.empty():
+                waiting.append(queue.queue.get_nowait())
+            for item in waiting:
+                if item[0] >= LOG:
+                    queue.queue.put_nowait(item)
+            self._start_workers(guild_id, queue)
+
+        workers = [worker for queue in self.guilds.values() for worker in queue.workers]
+        if workers:
+            _, unfinished = await asyncio.wait(workers, timeout=timeout)
+            for worker in unfinished:
+                worker.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+        self.guilds.clear()
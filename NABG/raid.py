@@ -0,0 +1,83 @@
+from array import array
+from typing import Optional, Tuple
+
+# Longest join-rate window a guild can configure, in seconds
+MAX_WINDOW = 300
+
+
+class SlidingCounter:
+    """
+    Events in the last `window` seconds, kept in a ring of per-second buckets.
+
+    The running total is updated as buckets fall out of the window, so adding
+    an event and reading the total are O(1); after a quiet spell the stale
+    buckets are cleared once, which is at most `window` steps.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buckets = array('I', bytes(4 * window))
+        self.total = 0
+        self._last: Optional[int] = None
+
+    def _advance(self, second: int):
+        if self._last is None or second - self._last >= self.window:
+            # Everything in the ring is out of the window
+            for index in range(self.window):
+                self.buckets[index] = 0
+            self.total = 0
+        else:
+            for elapsed in range(self._last + 1, second + 1):
+                index = elapsed % self.window
+                self.total -= self.buckets[index]
+                self.buckets[index] = 0
+        self._last = second
+
+    def add(self, second: int, amount: int = 1):
+        if self._last is None or second > self._last:
+            self._advance(second)
+        self.buckets[second % self.window] += amount
+        self.total += amount
+
+    def count(self, second: int) -> int:
+        """Events in the window ending at `second`; `total` only moves on when events are added"""
+        if self._last is None or second > self._last:
+            self._advance(second)
+        return self.total
+
+
+class RaidDetector:
+    """Join rate and share of young accounts for one guild, and whether raid mode is on"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.joins = SlidingCounter(window)
+        self.young = SlidingCounter(window)
+        # Monotonic time raid mode ends
+        self.raid_until = 0.0
+        self.raids = 0
+
+    def record(self, now: float, young: bool, max_joins: int, young_percent: int, duration: float) -> bool:
+        """Count a join; True if it set off raid mode"""
+        second = int(now)
+        self.joins.add(second)
+        self.young.add(second, 1 if young else 0)
+        if self.joins.total < max_joins or self.young.total * 100 < young_percent * self.joins.total:
+            return False
+        started = not self.active(now)
+        # Raid mode lasts until the joins have calmed down for `duration`
+        self.raid_until = now + duration
+        if started:
+            self.raids += 1
+        return started
+
+    def recent(self, now: float) -> Tuple[int, int]:
+        """Joins and young joins within the window ending at `now`"""
+        second = int(now)
+        return self.joins.count(second), self.young.count(second)
+
+    def active(self, now: float) -> bool:
+        return now < self.raid_until
+
+    def end(self):
+        self.raid_until = 0.0
@@ -0,0 +1,168 @@
+import gzip
+import json
+import lzma
+import os
+import re
+import time
+from typing import Dict, Iterator, List, Optional
+
+from .storage import write_json_atomic
+
+# Segment compressors by file extension
+COMPRESSORS = {".gz": gzip.open, ".xz": lzma.open}
+
+
+def segment_summary(file_name: str, label: str, matches: List[dict]) -> dict:
+    """Index entry describing one segment's matches"""
+    teams: Dict[str, List[int]] = {}
+    for match in matches:
+        teams.setdefault(match["winner"], [0, 0])[0] += 1
+        teams.setdefault(match["loser"], [0, 0])[1] += 1
+    timestamps = [match.get("timestamp", 0) for match in matches]
+    return {
+        "file": file_name,
+        "label": label,
+        "archived_at": int(time.time()),
+        "count": len(matches),
+        "first": min(timestamps, default=0),
+        "last": max(timestamps, default=0),
+        # Team ID -> [wins, losses] within the segment
+        "teams": teams,
+        "match_ids": [match["match_id"] for match in matches],
+        # Segments from before team IDs refer to teams by name
+        "team_ids": True,
+    }
+
+
+class MatchArchive:
+    """
+    Compressed cold storage for matches moved out of a guild's working data.
+
+    Every archival run writes one immutable segment of JSON lines, and a small
+    index lists each segment's time range, match IDs and per-team records, so a
+    lookup only decompresses the segments that can hold what it is after. All
+    methods block; run them in an executor.
+    """
+
+    def __init__(self, directory: str, extension: str = ".xz"):
+        self.directory = directory
+        self.index_file = os.path.join(directory, "index.json")
+        self.extension = extension
+        self._segments: Optional[List[dict]] = None
+        # Match ID -> segment index entry, built on the first lookup by ID
+        self._locations: Optional[Dict[str, dict]] = None
+        # Old team name -> team ID, for segments written before teams had IDs
+        self.legacy_names: Dict[str, str] = {}
+
+    @property
+    def segments(self) -> List[dict]:
+        """The segment index, read from disk on first use"""
+        if self._segments is None:
+            try:
+                with open(self.index_file, 'r') as f:
+                    self._segments = json.load(f)["segments"]
+            except FileNotFoundError:
+                self._segments = []
+            except (json.JSONDecodeError, KeyError):
+                # The segments themselves are the source of truth
+                self._segments = self._rebuild_index()
+        return self._segments
+
+    def _rebuild_index(self) -> List[dict]:
+        segments = []
+        for file_name in sorted(os.listdir(self.directory)):
+            extension = os.path.splitext(file_name)[1]
+            if extension not in COMPRESSORS or ".jsonl" not in file_name:
+                continue
+            label = file_name.split("-", 1)[-1].split(".jsonl")[0]
+            matches = [self._with_team_ids(match) for match in self._read(file_name)]
+            segments.append(segment_summary(file_name, label, matches))
+        write_json_atomic(self.index_file, {"segments": segments}, indent=None)
+        return segments
+
+    def write_segment(self, label: str, matches: List[dict]) -> dict:
+        """Store matches, oldest first, as a new segment and add it to the index"""
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_]+", "_", label).strip("_")[:40] or "segment"
+        file_name = f"{len(self.segments) + 1:05d}-{slug}.jsonl{self.extension}"
+        path = os.path.join(self.directory, file_name)
+
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'wb') as raw:
+            with COMPRESSORS[self.extension](raw, 'wt', encoding='utf-8') as f:
+                for match in matches:
+                    f.write(json.dumps(match, separators=(',', ':')) + "\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_file, path)
+
+        entry = segment_summary(file_name, label, matches)
+        self.segments.append(entry)
+        write_json_atomic(self.index_file, {"segments": self.segments}, indent=None)
+        self._locations = None
+        return entry
+
+    def _read(self, file_name: str) -> Iterator[dict]:
+        opener = COMPRESSORS[os.path.splitext(file_name)[1]]
+        with opener(os.path.join(self.directory, file_name), 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _with_team_ids(self, match: dict) -> dict:
+        """Point a match from before team IDs at the IDs its teams were given"""
+        if match["winner"] in self.legacy_names or match["loser"] in self.legacy_names:
+            match["teams"] = [self.legacy_names.get(name, name) for name in match["teams"]]
+            match["winner"] = self.legacy_names.get(match["winner"], match["winner"])
+            match["loser"] = self.legacy_names.get(match["loser"], match["loser"])
+        return match
+
+    def _matches(self, entry: dict) -> Iterator[dict]:
+        for match in self._read(entry["file"]):
+            yield match if entry.get("team_ids") else self._with_team_ids(match)
+
+    def _teams(self, entry: dict) -> Dict[str, List[int]]:
+        """A segment's per-team records, keyed by team ID"""
+        if entry.get("team_ids"):
+            return entry["teams"]
+        return {self.legacy_names.get(name, name): record for name, record in entry["teams"].items()}
+
+    def find(self, match_id: str) -> Optional[dict]:
+        """An archived match by ID, or None"""
+        if self._locations is None:
+            self._locations = {
+                archived_id: entry
+                for entry in self.segments
+                for archived_id in entry["match_ids"]
+            }
+        entry = self._locations.get(match_id)
+        if entry is None:
+            return None
+        return next((match for match in self._matches(entry) if match["match_id"] == match_id), None)
+
+    def all_matches(self) -> List[dict]:
+        """Every archived match, oldest first"""
+        matches = []
+        seen = set()
+        for entry in self.segments:
+            for match in self._matches(entry):
+                if match["match_id"] not in seen:
+                    seen.add(match["match_id"])
+                    matches.append(match)
+        return matches
+
+    def team_history(self, team_id: str, since: int = -1) -> List[dict]:
+        """Every archived match a team played after the timestamp `since`, oldest first"""
+        history = []
+        seen = set()
+        for entry in self.segments:
+            if team_id not in self._teams(entry) or entry.get("last", 0) <= since:
+                continue
+            for match in self._matches(entry):
+                if team_id not in match["teams"] or match.get("timestamp", 0) <= since:
+                    continue
+                # A crash between writing a segment and journaling it can archive a match twice
+                if match["match_id"] not in seen:
+                    seen.add(match["match_id"])
+                    history.append(match)
+        return history
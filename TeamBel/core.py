@@ -4,122 +4,353 @@ from redbot.core.bot import Red
 import uuid
 import json
 import os
-import aiohttp
-import imghdr
+import time
 import asyncio
-from typing import Optional, List
+import logging
+from datetime import datetime, timezone
+from collections import ChainMap
+from typing import Dict, Optional, List, Union
+
+from .guild_data import BACKENDS, GuildData, convert_backend, import_legacy
+from .images import ImageValidator
+from .storage import BackgroundWriter, new_team_id
+from .rating import DEFAULT_RATING, format_streak
+from .roster import MAX_ROSTER_BYTES, RosterError, parse_roster
+from .stats import STAT_LABELS
+from .views import LeaderboardView, MatchLogView, PaginatorRegistry, TeamListView
+
+log = logging.getLogger("red.teambel")
+
+
+class MatchLogFlags(commands.FlagConverter, prefix='--', delimiter=' '):
+    opponent: Optional[str] = None
+    game: Optional[str] = None
+    archived: bool = False
+
+
+class MatchRangeFlags(commands.FlagConverter, prefix='--', delimiter=' '):
+    team: Optional[str] = None
+    since: Optional[str] = None
+    until: Optional[str] = None
+
+
+def parse_day(value: str, end_of_day: bool = False) -> int:
+    """UTC epoch seconds for a YYYY-MM-DD date, at its start or its last second"""
+    day = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    timestamp = int(day.timestamp())
+    return timestamp + 86399 if end_of_day else timestamp
 
 class TeamBel(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.teams_file = 'teams_data.json'
-        self.config_file = 'team_battle_config.json'
-        self.events_channel_id = None
+        # Each guild gets its own subdirectory of teams, matches and settings
+        self.data_dir = 'teambel_data'
+        # Cog-wide settings, currently just which storage engine guilds use
+        self.settings_file = os.path.join(self.data_dir, 'settings.json')
+        self.backend = 'json'
+        # Files from before data was split per guild, imported with importlegacyteams
+        self.legacy_teams_file = 'teams_data.json'
+        self.legacy_journal_file = 'teams_data.journal'
+        self.legacy_config_file = 'team_battle_config.json'
+        # Open battles by message ID, persisted per guild so they survive restarts
+        self.battles_file_name = 'active_battles.json'
+        # All guilds' battles were once kept in one file, moved into the guilds on load
+        self.legacy_battles_file = os.path.join(self.data_dir, 'active_battles.json')
         self.active_battles = {}
-        self.battle_winner_roles = []
-        self.battle_config = {}
-        self.load_teams()
-        self.load_config()
-
-    def load_teams(self):
-        """Load teams data from JSON file"""
-        if os.path.exists(self.teams_file):
-            try:
-                with open(self.teams_file, 'r') as f:
-                    self.teams = json.load(f)
-            except json.JSONDecodeError:
-                self.teams = {}
-                self.save_teams()
-        else:
-            self.teams = {}
-            self.save_teams()
+        # Guild data loaded so far, keyed by guild ID
+        self.guilds: Dict[int, GuildData] = {}
+        self._loading: Dict[int, asyncio.Task] = {}
+        # Cleared while a backend switch rewrites every guild's files
+        self._storage_ready = asyncio.Event()
+        self._storage_ready.set()
+        # Guild ID -> set once a legacy import into that guild has finished
+        self._importing: Dict[int, asyncio.Event] = {}
+        # Seconds a guild can go unused before its data is dropped from memory
+        self.idle_timeout = 1800
+        # Seconds to gather mutations before they are written in one batch
+        self.save_delay = 2.0
+        self.writer = BackgroundWriter(delay=self.save_delay)
+        # One pooled HTTP session and result cache shared by all image checks
+        self.image_validator = ImageValidator()
+        # Live paginated messages; the oldest stop responding past the limit
+        self.paginators = PaginatorRegistry(max_views=50)
+        self._evict_task = None
+        self._expire_task = None
+
+    async def cog_load(self):
+        self.writer.start()
+        settings = await asyncio.get_running_loop().run_in_executor(None, self._read_settings)
+        self.backend = settings.get('backend', 'json')
+        self.active_battles = await asyncio.get_running_loop().run_in_executor(None, self._read_battles)
+        if os.path.exists(self.legacy_battles_file):
+            await self._migrate_legacy_battles()
+        self._expire_task = asyncio.create_task(self._expire_battles())
+        self._evict_task = asyncio.create_task(self._evict_idle_guilds())
+
+    async def cog_unload(self):
+        for task in (self._evict_task, self._expire_task):
+            if task:
+                task.cancel()
+        # Fold every loaded journal and flush everything still queued
+        for guild_data in self.guilds.values():
+            guild_data.unload()
+        await self.writer.close()
+        await self.image_validator.close()
+        self.paginators.stop_all()
+
+    async def get_guild_data(self, guild: discord.Guild) -> GuildData:
+        """Return a guild's data, loading it from disk on first use"""
+        # Never load a guild, or hand one out, while its stored data is being rewritten
+        while not self._storage_ready.is_set() or guild.id in self._importing:
+            await self._storage_ready.wait()
+            importing = self._importing.get(guild.id)
+            if importing is not None:
+                await importing.wait()
+
+        guild_data = self.guilds.get(guild.id)
+        if guild_data is None:
+            # Concurrent commands in a cold guild share one load
+            task = self._loading.get(guild.id)
+            if task is None:
+                task = asyncio.create_task(self._load_guild_data(guild.id))
+                self._loading[guild.id] = task
+                task.add_done_callback(lambda _: self._loading.pop(guild.id, None))
+            guild_data = await asyncio.shield(task)
+        guild_data.last_used = time.monotonic()
+        return guild_data
+
+    async def _load_guild_data(self, guild_id: int) -> GuildData:
+        guild_data = GuildData(guild_id, self.data_dir, self.writer, self.backend)
+        # Anything still queued for this guild must hit the disk before we read it back
+        await self.writer.flush()
+        await asyncio.get_running_loop().run_in_executor(None, guild_data.load)
+        if guild_data.store.pending and guild_data.store.pending >= guild_data.store.compact_every:
+            guild_data.store.compact()
+        self.guilds[guild_id] = guild_data
+        return guild_data
+
+    async def _evict_idle_guilds(self):
+        """Drop guilds nobody has used for a while so memory tracks active guilds"""
+        while True:
+            await asyncio.sleep(self.idle_timeout / 4)
+            cutoff = time.monotonic() - self.idle_timeout
+            for guild_id, guild_data in list(self.guilds.items()):
+                if guild_data.last_used < cutoff:
+                    guild_data.unload()
+                    del self.guilds[guild_id]
+                elif guild_data.archive_after_days:
+                    try:
+                        await self.archive_aged_months(guild_data)
+                    except OSError:
+                        log.exception("Archiving old matches of guild %s failed", guild_id)
+
+    async def archive_aged_months(self, guild_data: GuildData) -> int:
+        """
+        Archive each calendar month whose matches are all past the guild's archive age.
 
-    def save_teams(self):
-        """Save teams data to JSON file"""
-        with open(self.teams_file, 'w') as f:
-            json.dump(self.teams, f, indent=4)
+        Months are archived whole, one segment each, so a busy guild gains about one
+        segment a month rather than one every sweep.
+        """
+        aged = datetime.fromtimestamp(time.time() - guild_data.archive_after_days * 86400, timezone.utc)
+        boundary = aged.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        archived = 0
+        while guild_data.timeline and guild_data.timeline[0][0] < boundary.timestamp():
+            month = datetime.fromtimestamp(guild_data.timeline[0][0], timezone.utc)
+            month = month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            next_month = month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+            archived += await self.archive_matches(guild_data, month.strftime("%Y-%m"), int(next_month.timestamp()) - 1)
+        return archived
+
+    async def archive_matches(self, guild_data: GuildData, label: str, until: Optional[int] = None) -> int:
+        """Move a guild's matches played up to `until` into a new archive segment"""
+        async with guild_data.archive_lock:
+            match_ids = guild_data.matches_between(until=until)
+            if not match_ids:
+                return 0
+            # Copies, so the segment is written from a stable view of the matches
+            matches = [dict(guild_data.matches[match_id]) for match_id in match_ids]
+            await asyncio.get_running_loop().run_in_executor(None, guild_data.archive.write_segment, label, matches)
+            # Only drop them from the working set once the segment is safely on disk
+            guild_data.commit({"op": "match_archive", "match_ids": match_ids})
+            await self.writer.flush()
+            return len(match_ids)
+
+    async def _expire_battles(self):
+        """Forget battles that stayed open longer than their guild allows"""
+        while True:
+            await asyncio.sleep(600)
+            now = time.time()
+            expired = [
+                message_id for message_id, battle in self.active_battles.items()
+                if battle.get('expires_at') and battle['expires_at'] <= now
+            ]
+            guild_ids = {self.active_battles.pop(message_id)['guild_id'] for message_id in expired}
+            for guild_id in guild_ids:
+                self.save_battles(guild_id)
 
-    def load_config(self):
-        """Load battle configuration"""
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                    self.battle_winner_roles = config.get('battle_winner_roles', [])
-                    self.events_channel_id = config.get('events_channel_id')
-                    
-                    # Load battle image URL if exists
-                    self.battle_config = {
-                        'battle_image_url': config.get('battle_image_url')
-                    }
-            except json.JSONDecodeError:
-                self.reset_config()
-        else:
-            self.reset_config()
-
-    def reset_config(self):
-        """Reset configuration to default values"""
-        self.battle_winner_roles = []
-        self.events_channel_id = None
-        self.battle_config = {}
-        self.save_config()
-
-    def save_config(self):
-        """Save battle configuration"""
-        with open(self.config_file, 'w') as f:
-            json.dump({
-                'battle_winner_roles': self.battle_winner_roles,
-                'events_channel_id': self.events_channel_id,
-                'battle_image_url': self.battle_config.get('battle_image_url')
-            }, f, indent=4)
+    def _battles_file(self, guild_id: int) -> str:
+        return os.path.join(self.data_dir, str(guild_id), self.battles_file_name)
+
+    @staticmethod
+    def _read_battles_file(path: str) -> dict:
+        try:
+            with open(path, 'r') as f:
+                battles = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        # JSON object keys are strings; reactions carry integer message IDs
+        return {int(message_id): battle for message_id, battle in battles.items()}
+
+    def _read_battles(self) -> dict:
+        """Every guild's open battles, so reactions can be matched without loading the guild"""
+        if not os.path.isdir(self.data_dir):
+            return {}
+        battles = {}
+        for entry in os.listdir(self.data_dir):
+            if entry.isdigit():
+                battles.update(self._read_battles_file(self._battles_file(int(entry))))
+        return battles
+
+    async def _migrate_legacy_battles(self):
+        """Move the battles from the old cog-wide file into their guilds' files"""
+        legacy = await asyncio.get_running_loop().run_in_executor(
+            None, self._read_battles_file, self.legacy_battles_file
+        )
+        guild_ids = set()
+        for message_id, battle in legacy.items():
+            # Every battle in that file was opened after battles recorded their guild
+            if 'guild_id' in battle:
+                self.active_battles.setdefault(message_id, battle)
+                guild_ids.add(battle['guild_id'])
+        for guild_id in guild_ids:
+            self.save_battles(guild_id)
+        # Removed only once the guilds' files are written
+        await self.writer.flush()
+        os.remove(self.legacy_battles_file)
+
+    def save_battles(self, guild_id: int):
+        """Queue a guild's open battles to be saved in the background"""
+        self.writer.replace_json(self._battles_file(guild_id), {
+            str(message_id): battle for message_id, battle in self.active_battles.items()
+            if battle['guild_id'] == guild_id
+        })
+
+    def _read_settings(self) -> dict:
+        if not os.path.exists(self.settings_file):
+            return {}
+        try:
+            with open(self.settings_file, 'r') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
 
     async def validate_image_url(self, url: str) -> bool:
         """
         Validate if the provided URL is a valid image
         Returns True if it's a valid image, False otherwise
         """
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        return False
-                    
-                    # Read a small portion of the image to validate
-                    content = await response.read()
-                    
-                    # Use imghdr to detect image type
-                    image_type = imghdr.what(None, h=content)
-                    
-                    # Check if it's a valid image type
-                    return image_type in ['png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp']
-        except Exception:
-            return False
-
-    def can_select_winner(self, user):
+        return await self.image_validator.validate(url)
+
+    def can_select_winner(self, user, guild_data: GuildData):
         """Check if user can select a battle winner"""
         # Administrators always can select
         if user.guild_permissions.administrator:
             return True
         
         # Check if user has any of the allowed roles
-        return any(role.id in self.battle_winner_roles for role in user.roles)
+        return any(role.id in guild_data.battle_winner_roles for role in user.roles)
     
     def can_use_command_check():
         async def predicate(ctx):
-            return ctx.author.guild_permissions.administrator or any(
-                role.id in ctx.cog.battle_winner_roles for role in ctx.author.roles
-            )
+            if ctx.guild is None:
+                return False
+            if ctx.author.guild_permissions.administrator:
+                return True
+            guild_data = await ctx.cog.get_guild_data(ctx.guild)
+            return any(role.id in guild_data.battle_winner_roles for role in ctx.author.roles)
         return commands.check(predicate)
 
+    @commands.command(name='importlegacyteams')
+    @commands.is_owner()
+    @commands.guild_only()
+    async def import_legacy_teams(self, ctx):
+        """Import the teams from before data was split per guild into this guild"""
+        if not os.path.exists(self.legacy_teams_file):
+            await ctx.send("There is no legacy team data to import.")
+            return
+
+        guild_data = await self.get_guild_data(ctx.guild)
+        if guild_data.teams:
+            await ctx.send("This server already has teams; legacy data can only be imported into an empty server.")
+            return
+
+        # Hold back get_guild_data for this guild until the import has replaced its data
+        done = self._importing[ctx.guild.id] = asyncio.Event()
+        try:
+            # Drop the loaded copy; the import replaces this guild's stored data
+            guild_data.store.close()
+            self.guilds.pop(ctx.guild.id, None)
+            await self.writer.flush()
+            team_count = await asyncio.get_running_loop().run_in_executor(
+                None,
+                import_legacy,
+                self.legacy_teams_file,
+                self.legacy_journal_file,
+                self.legacy_config_file,
+                guild_data,
+            )
+        finally:
+            self.guilds.pop(ctx.guild.id, None)
+            del self._importing[ctx.guild.id]
+            done.set()
+        await ctx.send(f"Imported {team_count} teams into this server.")
+
+    @commands.command(name='teambackend')
+    @commands.is_owner()
+    async def set_team_backend(self, ctx, backend: str):
+        """Choose where team data is stored: json or sqlite"""
+        backend = backend.lower()
+        if backend not in BACKENDS:
+            await ctx.send(f"Unknown backend. Choose one of: {', '.join(BACKENDS)}")
+            return
+        if backend == self.backend:
+            await ctx.send(f"Team data is already stored with {backend}.")
+            return
+
+        # Hold back get_guild_data everywhere until the conversion is over
+        self._storage_ready.clear()
+        try:
+            # Let loads already under way finish, so none lands after the conversion
+            await asyncio.gather(*self._loading.values(), return_exceptions=True)
+
+            # Get everything onto disk and out of memory, then convert every guild in one go
+            for guild_data in self.guilds.values():
+                guild_data.unload()
+            self.guilds.clear()
+            await self.writer.flush()
+            converted = await asyncio.get_running_loop().run_in_executor(
+                None, convert_backend, self.data_dir, self.backend, backend, self.writer
+            )
+            self.backend = backend
+            self.writer.replace_json(self.settings_file, {'backend': backend})
+        finally:
+            # Nothing loaded with the old engine may outlive the switch
+            for guild_data in self.guilds.values():
+                guild_data.unload()
+            self.guilds.clear()
+            self._storage_ready.set()
+        await ctx.send(f"Converted {converted} servers to {backend} storage.")
+
     @commands.command(name='seteventschannel')
     @commands.has_permissions(administrator=True)
     async def set_events_channel(self, ctx, channel: discord.TextChannel = None):
         """Set the channel for battle event announcements"""
+        guild_data = await self.get_guild_data(ctx.guild)
         # If no channel is specified, use the current channel
         channel = channel or ctx.channel
         
-        self.events_channel_id = channel.id
-        self.save_config()
+        guild_data.events_channel_id = channel.id
+        guild_data.save_config()
         
         embed = discord.Embed(
             title="Events Channel Set", 
@@ -132,9 +363,10 @@ class TeamBel(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def add_battle_role(self, ctx, role: discord.Role):
         """Add a role that can select battle winners"""
-        if role.id not in self.battle_winner_roles:
-            self.battle_winner_roles.append(role.id)
-            self.save_config()
+        guild_data = await self.get_guild_data(ctx.guild)
+        if role.id not in guild_data.battle_winner_roles:
+            guild_data.battle_winner_roles.append(role.id)
+            guild_data.save_config()
             await ctx.send(f"Role {role.name} can now select battle winners.")
         else:
             await ctx.send(f"Role {role.name} is already allowed to select battle winners.")
@@ -143,9 +375,10 @@ class TeamBel(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def remove_battle_role(self, ctx, role: discord.Role):
         """Remove a role's ability to select battle winners"""
-        if role.id in self.battle_winner_roles:
-            self.battle_winner_roles.remove(role.id)
-            self.save_config()
+        guild_data = await self.get_guild_data(ctx.guild)
+        if role.id in guild_data.battle_winner_roles:
+            guild_data.battle_winner_roles.remove(role.id)
+            guild_data.save_config()
             await ctx.send(f"Role {role.name} can no longer select battle winners.")
         else:
             await ctx.send(f"Role {role.name} was not in the list of roles that can select battle winners.")
@@ -154,20 +387,21 @@ class TeamBel(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def list_battle_roles(self, ctx):
         """List roles that can select battle winners"""
-        if not self.battle_winner_roles:
+        guild_data = await self.get_guild_data(ctx.guild)
+        if not guild_data.battle_winner_roles:
             await ctx.send("No roles are currently allowed to select battle winners.")
             return
 
         # Resolve role names
         role_names = []
-        for role_id in self.battle_winner_roles:
+        for role_id in guild_data.battle_winner_roles:
             role = ctx.guild.get_role(role_id)
             if role:
                 role_names.append(role.name)
             else:
                 # Remove invalid role IDs
-                self.battle_winner_roles.remove(role_id)
-                self.save_config()
+                guild_data.battle_winner_roles.remove(role_id)
+                guild_data.save_config()
 
         embed = discord.Embed(
             title="Roles Allowed to Select Battle Winners", 
@@ -176,17 +410,31 @@ class TeamBel(commands.Cog):
         )
         await ctx.send(embed=embed)
 
+    @commands.command(name='setteamlistsize')
+    @commands.has_permissions(administrator=True)
+    async def set_team_list_size(self, ctx, page_size: int):
+        """Set how many teams each page of the team list shows"""
+        if not 1 <= page_size <= 25:
+            await ctx.send("Please choose a page size between 1 and 25.")
+            return
+
+        guild_data = await self.get_guild_data(ctx.guild)
+        guild_data.list_page_size = page_size
+        guild_data.save_config()
+        await ctx.send(f"The team list will now show {page_size} teams per page.")
+
     @commands.group(name='team')
     async def team_management(self, ctx):
         """Base command for team management"""
         if ctx.invoked_subcommand is None:
-            await ctx.send("Invalid team command. Use *team create/add/remove/list/info/setlogo")
+            await ctx.send("Invalid team command. Use *team create/add/remove/import/list/info/setlogo/whois/leaderboard/matches/h2h/stats")
 
     @team_management.command(name='create')
     @can_use_command_check()
     async def create_team(self, ctx, team_name: str, logo_url: Optional[str] = None, *, description: str = "No description provided"):
         """Create a new team with optional logo"""
-        if team_name in self.teams:
+        guild_data = await self.get_guild_data(ctx.guild)
+        if guild_data.resolve(team_name):
             await ctx.send(f"Team '{team_name}' already exists!")
             return
 
@@ -197,16 +445,25 @@ class TeamBel(commands.Cog):
             if not logo_valid:
                 await ctx.send("Invalid logo URL. The team will be created without a logo.")
 
+        # Someone may have taken the name while the logo was being checked
+        if guild_data.resolve(team_name):
+            await ctx.send(f"Team '{team_name}' already exists!")
+            return
+
         # Create team with optional logo
-        self.teams[team_name] = {
-            "description": description,
-            "members": [],
-            "wins": 0,
-            "losses": 0,
-            "match_log": [],
-            "logo_url": logo_url if logo_valid else None
-        }
-        self.save_teams()
+        guild_data.commit({
+            "op": "team_create",
+            "team": new_team_id(),
+            "data": {
+                "name": team_name,
+                "description": description,
+                "members": [],
+                "wins": 0,
+                "losses": 0,
+                "match_log": [],
+                "logo_url": logo_url if logo_valid else None
+            }
+        })
         
         # Confirm team creation
         embed = discord.Embed(title="Team Created", color=discord.Color.green())
@@ -221,12 +478,14 @@ class TeamBel(commands.Cog):
     @can_use_command_check()
     async def delete_team(self, ctx, team_name: str):
         """Delete a team from the list and remove it from the JSON file"""
-        if team_name not in self.teams:
+        guild_data = await self.get_guild_data(ctx.guild)
+        team_id = guild_data.resolve(team_name)
+        if team_id is None:
             await ctx.send(f"Team '{team_name}' does not exist!")
             return
+        team_name = guild_data.team_name(team_id)
 
-        del self.teams[team_name]  # Remove from dictionary
-        self.save_teams()  # Save updated data to JSON
+        guild_data.commit({"op": "team_delete", "team": team_id, "name": team_name})
 
         await ctx.send(f"Team '{team_name}' has been deleted successfully!")
 
@@ -234,9 +493,12 @@ class TeamBel(commands.Cog):
     @can_use_command_check()
     async def set_team_logo(self, ctx, team_name: str, logo_url: str):
         """Set or update a team's logo"""
-        if team_name not in self.teams:
+        guild_data = await self.get_guild_data(ctx.guild)
+        team_id = guild_data.resolve(team_name)
+        if team_id is None:
             await ctx.send(f"Team '{team_name}' does not exist!")
             return
+        team_name = guild_data.team_name(team_id)
 
         # Validate logo URL
         logo_valid = await self.validate_image_url(logo_url)
@@ -244,9 +506,14 @@ class TeamBel(commands.Cog):
             await ctx.send("Invalid logo URL. Please provide a valid image URL.")
             return
 
+        # The team may have been deleted while the logo was being checked
+        if team_id not in guild_data.teams:
+            await ctx.send(f"Team '{team_name}' no longer exists!")
+            return
+        team_name = guild_data.team_name(team_id)
+
         # Update team logo
-        self.teams[team_name]['logo_url'] = logo_url
-        self.save_teams()
+        guild_data.commit({"op": "team_set", "team": team_id, "field": "logo_url", "value": logo_url})
 
         # Confirm logo update
         embed = discord.Embed(title="Team Logo Updated", color=discord.Color.blue())
@@ -257,173 +524,214 @@ class TeamBel(commands.Cog):
 
     @team_management.command(name='add')
     @can_use_command_check()
-    async def add_member(self, ctx, team_name: str, member: discord.Member):
-        """Add a member to a team by mentioning them"""
-        if team_name not in self.teams:
+    async def add_member(self, ctx, team_name: str, *members: discord.Member):
+        """Add one or more members to a team by mentioning them"""
+        guild_data = await self.get_guild_data(ctx.guild)
+        team_id = guild_data.resolve(team_name)
+        if team_id is None:
             await ctx.send(f"Team '{team_name}' does not exist!")
             return
-
-        if member.id in self.teams[team_name]["members"]:
-            await ctx.send(f"{member.mention} is already in the team!")
+        team_name = guild_data.team_name(team_id)
+        if not members:
+            await ctx.send("Mention at least one member to add.")
             return
 
-        # Set the first added member as Team Leader
-        if not self.teams[team_name].get("leader"):
-            self.teams[team_name]["leader"] = member.id
-        
-        self.teams[team_name]["members"].append(member.id)
-        self.save_teams()
-        await ctx.send(f"{member.mention} added to team '{team_name}'!")
+        added = []
+        skipped = []
+        for member in members:
+            if guild_data.is_member(team_id, member.id) or member in added:
+                skipped.append(member)
+            else:
+                added.append(member)
+
+        if added:
+            # One record for the whole list; the first added member becomes Team Leader
+            guild_data.commit({
+                "op": "batch",
+                "ops": [{"op": "member_add", "team": team_id, "member": member.id} for member in added],
+            })
+
+        lines = []
+        if added:
+            lines.append(f"{', '.join(member.mention for member in added)} added to team '{team_name}'!")
+        if skipped:
+            lines.append(f"Already in the team: {', '.join(member.mention for member in skipped)}")
+        await ctx.send("\n".join(lines))
 
     @team_management.command(name='remove')
     @can_use_command_check()
-    async def remove_member(self, ctx, team_name: str, user_id: int):
-        """Remove a member from a team"""
-        if team_name not in self.teams:
+    async def remove_member(self, ctx, team_name: str, *users: Union[discord.Member, int]):
+        """Remove one or more members from a team by mention or user ID"""
+        guild_data = await self.get_guild_data(ctx.guild)
+        team_id = guild_data.resolve(team_name)
+        if team_id is None:
             await ctx.send(f"Team '{team_name}' does not exist!")
             return
+        team_name = guild_data.team_name(team_id)
+        if not users:
+            await ctx.send("Give at least one member or user ID to remove.")
+            return
 
-        if user_id not in self.teams[team_name]["members"]:
-            await ctx.send(f"User {user_id} is not in the team!")
+        removed = []
+        missing = []
+        for user in users:
+            user_id = user if isinstance(user, int) else user.id
+            if guild_data.is_member(team_id, user_id) and user_id not in removed:
+                removed.append(user_id)
+            elif user_id not in removed:
+                missing.append(user_id)
+
+        if removed:
+            guild_data.commit({
+                "op": "batch",
+                "ops": [{"op": "member_remove", "team": team_id, "member": user_id} for user_id in removed],
+            })
+
+        lines = []
+        if removed:
+            lines.append(f"{', '.join(f'<@{user_id}>' for user_id in removed)} removed from team '{team_name}'!")
+        if missing:
+            lines.append(f"Not in the team: {', '.join(f'<@{user_id}>' for user_id in missing)}")
+        await ctx.send("\n".join(lines), allowed_mentions=discord.AllowedMentions.none())
+
+    @team_management.command(name='import')
+    @can_use_command_check()
+    async def import_rosters(self, ctx):
+        """Create teams and add members from an attached CSV or JSON roster
+
+        CSV rows are `team,member,member,...`; JSON is `{"Team": [member, ...]}`.
+        Members are user IDs or mentions. Nothing is imported if any row is invalid.
+        """
+        if not ctx.message.attachments:
+            await ctx.send("Attach a .csv or .json roster file to the command.")
             return
+        attachment = ctx.message.attachments[0]
+        if attachment.size > MAX_ROSTER_BYTES:
+            await ctx.send("That roster file is too large.")
+            return
+
+        problems = []
+        try:
+            rosters = parse_roster(attachment.filename, await attachment.read())
+        except RosterError as error:
+            rosters = {}
+            problems = error.problems
+
+        guild_data = await self.get_guild_data(ctx.guild)
+        ops = []
+        created = 0
+        added = 0
+        skipped = 0
+        for team_name, member_ids in rosters.items():
+            team_id = guild_data.resolve(team_name)
+            current = set()
+            if team_id is None:
+                team_id = new_team_id()
+                created += 1
+                ops.append({
+                    "op": "team_create",
+                    "team": team_id,
+                    "data": {
+                        "name": team_name,
+                        "description": "No description provided",
+                        "members": [],
+                        "wins": 0,
+                        "losses": 0,
+                        "match_log": [],
+                        "logo_url": None
+                    }
+                })
+            else:
+                current = guild_data.team_members.get(team_id, set())
 
-        self.teams[team_name]["members"].remove(user_id)
-        self.save_teams()
-        await ctx.send(f"User {user_id} removed from team '{team_name}'!")
+            for member_id in member_ids:
+                if ctx.guild.get_member(member_id) is None:
+                    problems.append(f"{team_name}: <@{member_id}> is not in this server")
+                elif member_id in current:
+                    skipped += 1
+                else:
+                    ops.append({"op": "member_add", "team": team_id, "member": member_id})
+                    added += 1
+
+        if problems:
+            embed = discord.Embed(
+                title="Roster Not Imported",
+                description="\n".join(problems[:15]) + (f"\n*+ {len(problems) - 15} more*" if len(problems) > 15 else ""),
+                color=discord.Color.red()
+            )
+            embed.set_footer(text="Nothing was changed. Fix the file and try again.")
+            await ctx.send(embed=embed)
+            return
+
+        # Validated as a whole, then persisted as a single journal record
+        if ops:
+            guild_data.commit({"op": "batch", "ops": ops})
+
+        embed = discord.Embed(title="Roster Imported", color=discord.Color.green())
+        embed.add_field(name="Teams Created", value=created, inline=True)
+        embed.add_field(name="Members Added", value=added, inline=True)
+        embed.add_field(name="Already On Team", value=skipped, inline=True)
+        await ctx.send(embed=embed)
+
+    @team_management.command(name='whois')
+    async def member_teams(self, ctx, member: discord.Member):
+        """Show which teams a member is on"""
+        guild_data = await self.get_guild_data(ctx.guild)
+        teams = sorted((guild_data.teams[team_id] for team_id in guild_data.teams_of(member.id)), key=lambda team: team['name'].casefold())
+
+        embed = discord.Embed(title=f"Teams for {member.display_name}", color=discord.Color.blue())
+        lines = []
+        for team in teams:
+            line = team['name']
+            if team.get("leader") == member.id:
+                line += " *(Team Leader)*"
+            lines.append(line)
+        embed.description = "\n".join(lines) or f"{member.mention} is not on any team."
+        await ctx.send(embed=embed)
 
     @team_management.command(name='list')
     async def list_teams(self, ctx):
         """List teams with pagination"""
-        # Convert teams to a sorted list
-        sorted_teams = sorted(self.teams.keys())
+        guild_data = await self.get_guild_data(ctx.guild)
+        # Convert teams to a list sorted by name
+        sorted_teams = sorted(guild_data.teams, key=lambda team_id: guild_data.teams[team_id]['name'].casefold())
         
         if not sorted_teams:
             await ctx.send("No teams have been created yet.")
             return
 
-        # Initialize pagination
-        self.team_list_pages = {}
-        self.team_list_current_page = {}
+        # Buttons page through a snapshot of the names taken now
+        view = TeamListView(self.paginators, guild_data.teams, sorted_teams, guild_data.list_page_size)
+        await view.send(ctx)
 
-        # Create initial page
-        def create_team_list_embed(start_index):
-            embed = discord.Embed(
-                title="Team List", 
-                color=discord.Color.blue()
-            )
-            
-            # Add up to 2 teams per page
-            for i in range(start_index, min(start_index + 2, len(sorted_teams))):
-                team_name = sorted_teams[i]
-                team_info = self.teams[team_name]
-                
-                embed.add_field(
-                    name=team_name, 
-                    value=(
-                        f"**Description:** {team_info['description']}\n"
-                        f"**Wins:** {team_info['wins']}\n"
-                        f"**Losses:** {team_info['losses']}\n"
-                        f"**Members:** {len(team_info['members'])}"
-                    ), 
-                    inline=False
-                )
-            
-            # Add page info
-            current_page = start_index // 2 + 1
-            total_pages = (len(sorted_teams) + 1) // 2
-            embed.set_footer(text=f"Page {current_page}/{total_pages}")
-            
-            return embed, current_page, total_pages
-
-        # Send initial page
-        initial_embed, current_page, total_pages = create_team_list_embed(0)
-        message = await ctx.send(embed=initial_embed)
-
-        # Store page information for this message
-        self.team_list_pages[message.id] = {
-            'teams': sorted_teams,
-            'current_page': current_page,
-            'total_pages': total_pages,
-            'create_embed': create_team_list_embed
-        }
-        self.team_list_current_page[message.id] = 0
-
-        # Add navigation reactions
-        if total_pages > 1:
-            await message.add_reaction('➡️')
-            await message.add_reaction('⬅️')
-
-    @commands.Cog.listener()
-    async def on_reaction_add(self, reaction, user):
-        """Handle team list pagination"""
-        # Check if this is a team list message
-        if user.bot or reaction.message.id not in self.team_list_pages:
+    @team_management.command(name='leaderboard')
+    async def team_leaderboard(self, ctx):
+        """Show teams ranked by rating"""
+        guild_data = await self.get_guild_data(ctx.guild)
+        if not guild_data.teams:
+            await ctx.send("No teams have been created yet.")
             return
 
-        # Check if user is trying to paginate
-        if reaction.emoji == '➡️':
-            # Get page information
-            page_info = self.team_list_pages[reaction.message.id]
-            current_index = self.team_list_current_page[reaction.message.id]
-            
-            # Calculate next page index
-            next_index = current_index + 2
-            
-            # Check if we've reached the end
-            if next_index >= len(page_info['teams']):
-                await reaction.remove(user)
-                return
-
-            # Create new embed
-            new_embed, new_page, total_pages = page_info['create_embed'](next_index)
-            
-            # Update message
-            await reaction.message.edit(embed=new_embed)
-            
-            # Update tracking
-            self.team_list_current_page[reaction.message.id] = next_index
-            
-            # Add previous page reaction if not first page
-            if next_index > 0:
-                await reaction.message.add_reaction('⬅️')
-            
-            # Remove used reaction
-            await reaction.remove(user)
-        
-        elif reaction.emoji == '⬅️':
-            # Get page information
-            page_info = self.team_list_pages[reaction.message.id]
-            current_index = self.team_list_current_page[reaction.message.id]
-            
-            # Calculate previous page index
-            prev_index = max(0, current_index - 2)
-            
-            # Create new embed
-            new_embed, new_page, total_pages = page_info['create_embed'](prev_index)
-            
-            # Update message
-            await reaction.message.edit(embed=new_embed)
-            
-            # Update tracking
-            self.team_list_current_page[reaction.message.id] = prev_index
-            
-            # Remove used reaction
-            await reaction.remove(user)
+        view = LeaderboardView(self.paginators, guild_data)
+        await view.send(ctx)
 
     @team_management.command(name='resetmatchlog')
     @can_use_command_check()
     async def reset_match_log(self, ctx, team_name: str):
         """Reset a team's match log"""
+        guild_data = await self.get_guild_data(ctx.guild)
         # Check if team exists
-        if team_name not in self.teams:
+        team_id = guild_data.resolve(team_name)
+        if team_id is None:
             await ctx.send(f"Team '{team_name}' not found!")
             return
+        team_name = guild_data.team_name(team_id)
 
         # Confirm with the user before resetting
         confirm_message = await ctx.send(
             embed=discord.Embed(
                 title="Reset Match Log Confirmation", 
-                description=f"Are you sure you want to reset the match log for {team_name}? \n\n"
+                description=f"Are you sure you want to reset the match log and record of {team_name}? \n\n"
                             "React with ✅ to confirm or ❌ to cancel.",
                 color=discord.Color.orange()
             )
@@ -446,13 +754,12 @@ class TeamBel(commands.Cog):
 
             if str(reaction.emoji) == '✅':
                 # Reset match log
-                self.teams[team_name]['match_log'] = []
-                self.save_teams()
+                guild_data.commit({"op": "log_reset", "team": team_id, "at": int(time.time())})
 
                 # Create confirmation embed
                 embed = discord.Embed(
                     title="Match Log Reset", 
-                    description=f"Match log for team '{team_name}' has been cleared.", 
+                    description=f"Match log and record for team '{team_name}' have been cleared.", 
                     color=discord.Color.green()
                 )
                 await ctx.send(embed=embed)
@@ -464,17 +771,53 @@ class TeamBel(commands.Cog):
             # Timeout if no reaction within 60 seconds
             await ctx.send("Confirmation timed out. Match log was not reset.")
 
+    @team_management.group(name='stats')
+    async def team_stats(self, ctx):
+        """Maintain team records"""
+        if ctx.invoked_subcommand is None:
+            await ctx.send("Invalid stats command. Use *team stats rebuild")
+
+    @team_stats.command(name='rebuild')
+    @can_use_command_check()
+    async def rebuild_team_stats(self, ctx):
+        """Recompute every team's record from its match history and report any drift"""
+        guild_data = await self.get_guild_data(ctx.guild)
+        async with guild_data.archive_lock:
+            archived = await asyncio.get_running_loop().run_in_executor(None, guild_data.archive.all_matches)
+            drift = guild_data.rebuild_stats(archived)
+
+        if not drift:
+            await ctx.send(f"All {len(guild_data.teams)} team records match their match history.")
+            return
+
+        embed = discord.Embed(title="Team Stats Rebuilt", color=discord.Color.orange())
+        lines = []
+        for team_id, changed in list(drift.items())[:20]:
+            fields = ", ".join(
+                STAT_LABELS.get(field) or f"{field} {old} → {new}"
+                for field, (old, new) in changed.items()
+            )
+            lines.append(f"**{guild_data.team_name(team_id)}**: {fields}")
+        embed.description = "\n".join(lines)
+        footer = f"Fixed {len(drift)} of {len(guild_data.teams)} teams"
+        if len(drift) > 20:
+            footer += " (showing 20)"
+        embed.set_footer(text=footer)
+        await ctx.send(embed=embed)
+
     @team_management.command(name='updatedesc')
     @can_use_command_check()
     async def update_team_description(self, ctx, team_name: str, *, new_description: str):
         """Update an existing team's description"""
-        if team_name not in self.teams:
+        guild_data = await self.get_guild_data(ctx.guild)
+        team_id = guild_data.resolve(team_name)
+        if team_id is None:
             await ctx.send(f"Team '{team_name}' not found!")
             return
+        team_name = guild_data.team_name(team_id)
 
         # Update description
-        self.teams[team_name]['description'] = new_description
-        self.save_teams()
+        guild_data.commit({"op": "team_set", "team": team_id, "field": "description", "value": new_description})
 
         # Create confirmation embed
         embed = discord.Embed(
@@ -490,22 +833,21 @@ class TeamBel(commands.Cog):
     @can_use_command_check()
     async def rename_team(self, ctx, old_name: str, new_name: str):
         """Rename an existing team"""
+        guild_data = await self.get_guild_data(ctx.guild)
         # Check if old team exists
-        if old_name not in self.teams:
+        team_id = guild_data.resolve(old_name)
+        if team_id is None:
             await ctx.send(f"Team '{old_name}' not found!")
             return
+        old_name = guild_data.team_name(team_id)
 
-        # Check if new name is already taken
-        if new_name in self.teams:
+        # Check if new name is already taken; changing only its case is fine
+        if guild_data.resolve(new_name) not in (None, team_id):
             await ctx.send(f"Team name '{new_name}' is already in use!")
             return
 
-        # Rename the team
-        # Create a copy of the team data with the new key
-        self.teams[new_name] = self.teams.pop(old_name)
-
-        # Save the updated teams
-        self.save_teams()
+        # Matches refer to the team ID, so only the name itself changes
+        guild_data.commit({"op": "team_rename", "team": team_id, "name": new_name})
 
         # Create confirmation embed
         embed = discord.Embed(
@@ -520,11 +862,14 @@ class TeamBel(commands.Cog):
     @team_management.command(name='info')
     async def team_info(self, ctx, team_name: str):
         """Get detailed information about a specific team"""
-        if team_name not in self.teams:
+        guild_data = await self.get_guild_data(ctx.guild)
+        team_id = guild_data.resolve(team_name)
+        if team_id is None:
             await ctx.send(f"Team '{team_name}' does not exist!")
             return
+        team_name = guild_data.team_name(team_id)
 
-        team = self.teams[team_name]
+        team = guild_data.teams[team_id]
         embed = discord.Embed(title=f"Team: {team_name}", color=discord.Color.green())
         embed.description = team['description']
         
@@ -543,6 +888,33 @@ class TeamBel(commands.Cog):
         embed.add_field(name="Members", value="\n".join(member_mentions) or "No members", inline=False)
         embed.add_field(name="Wins", value=team['wins'], inline=True)
         embed.add_field(name="Losses", value=team['losses'], inline=True)
+        embed.add_field(
+            name="Rating",
+            value=f"{team.get('rating', DEFAULT_RATING)} (#{guild_data.leaderboard.rank(team_id)})",
+            inline=True
+        )
+        embed.add_field(name="Streak", value=format_streak(team.get('streak', 0)), inline=True)
+        recent_wins, recent_losses = guild_data.recent_record(team_id)
+        recent_played = recent_wins + recent_losses
+        embed.add_field(
+            name="Last 30 Days",
+            value=f"{recent_wins}W/{recent_losses}L ({recent_wins / recent_played:.0%})" if recent_played else "No matches",
+            inline=True
+        )
+
+        games = sorted(team.get('games', {}).items(), key=lambda item: -sum(item[1]))
+        if games:
+            lines = [f"{game}: {wins}W/{losses}L" for game, (wins, losses) in games[:5]]
+            if len(games) > 5:
+                lines.append(f"...and {len(games) - 5} more")
+            embed.add_field(name="Games", value="\n".join(lines), inline=False)
+        opponents = sorted(team.get('opponents', {}).items(), key=lambda item: -sum(item[1]))
+        if opponents:
+            lines = [
+                f"{guild_data.team_name(opponent_id)}: {wins}W/{losses}L"
+                for opponent_id, (wins, losses) in opponents[:3]
+            ]
+            embed.add_field(name="Most Played Opponents", value="\n".join(lines), inline=False)
         
         # Add team logo if available
         if team.get('logo_url'):
@@ -550,16 +922,51 @@ class TeamBel(commands.Cog):
         
         await ctx.send(embed=embed)
 
+    @team_management.command(name='h2h')
+    async def team_head_to_head(self, ctx, team_name: str, opponent_name: str):
+        """Show the head-to-head record between two teams"""
+        guild_data = await self.get_guild_data(ctx.guild)
+        team_id = guild_data.resolve(team_name)
+        opponent_id = guild_data.resolve(opponent_name)
+        for name, resolved in ((team_name, team_id), (opponent_name, opponent_id)):
+            if resolved is None:
+                await ctx.send(f"Team '{name}' does not exist!")
+                return
+        if team_id == opponent_id:
+            await ctx.send("Pick two different teams.")
+            return
+        team_name = guild_data.team_name(team_id)
+        opponent_name = guild_data.team_name(opponent_id)
+
+        team = guild_data.teams[team_id]
+        wins, losses = team.get('opponents', {}).get(opponent_id, (0, 0))
+        played = wins + losses
+        embed = discord.Embed(title=f"{team_name} vs {opponent_name}", color=discord.Color.blue())
+        if played:
+            embed.add_field(name=f"{team_name} Wins", value=wins, inline=True)
+            embed.add_field(name=f"{opponent_name} Wins", value=losses, inline=True)
+            embed.add_field(name="Matches", value=played, inline=True)
+            embed.add_field(name=f"{team_name} Win Rate", value=f"{wins / played:.0%}", inline=True)
+        else:
+            embed.description = "These teams have not played each other."
+
+        # Records kept from before head-to-head tracking don't add up to the team's totals
+        counted = sum(sum(record) for record in team.get('opponents', {}).values())
+        if counted != team['wins'] + team['losses']:
+            embed.set_footer(text="Older matches are not counted yet; run *team stats rebuild to include them.")
+        await ctx.send(embed=embed)
+
     @commands.group(name='battle')
     async def battle_management(self, ctx):
         """Base command for battle management"""
         if ctx.invoked_subcommand is None:
-            await ctx.send("Invalid battle command. Use *battle create or *battle setimage")
+            await ctx.send("Invalid battle command. Use *battle create, *battle setimage or *battle season")
 
     @battle_management.command(name='setimage')
     @commands.has_permissions(administrator=True)
     async def set_battle_image(self, ctx, image_url: str):
         """Set a custom battle image for future battles"""
+        guild_data = await self.get_guild_data(ctx.guild)
         # Validate the image URL
         is_valid = await self.validate_image_url(image_url)
         if not is_valid:
@@ -567,8 +974,8 @@ class TeamBel(commands.Cog):
             return
 
         # Update battle config
-        self.battle_config['battle_image_url'] = image_url
-        self.save_config()
+        guild_data.battle_config['battle_image_url'] = image_url
+        guild_data.save_config()
 
         # Create confirmation embed
         embed = discord.Embed(title="Battle Image Updated", color=discord.Color.green())
@@ -577,20 +984,105 @@ class TeamBel(commands.Cog):
         
         await ctx.send(embed=embed)
 
+    @battle_management.command(name='expiry')
+    @commands.has_permissions(administrator=True)
+    async def set_battle_expiry(self, ctx, hours: int):
+        """Set how many hours a battle stays open for results (0 keeps them open forever)"""
+        if hours < 0:
+            await ctx.send("Please provide a number of hours that is 0 or more.")
+            return
+
+        guild_data = await self.get_guild_data(ctx.guild)
+        guild_data.battle_expiry_hours = hours or None
+        guild_data.save_config()
+        if hours:
+            await ctx.send(f"New battles will expire after {hours} hours without a result.")
+        else:
+            await ctx.send("New battles will stay open until a winner is chosen.")
+
+    @battle_management.group(name='season')
+    async def season_management(self, ctx):
+        """Close seasons and browse archived ones"""
+        if ctx.invoked_subcommand is None:
+            await ctx.send("Invalid season command. Use *battle season end/list/archiveafter")
+
+    @season_management.command(name='end')
+    @commands.has_permissions(administrator=True)
+    async def end_season(self, ctx, *, label: Optional[str] = None):
+        """Archive every recorded match as a finished season"""
+        guild_data = await self.get_guild_data(ctx.guild)
+        label = label or f"season-{ctx.message.created_at.strftime('%Y-%m-%d')}"
+        archived = await self.archive_matches(guild_data, label)
+        if not archived:
+            await ctx.send("There are no matches to archive.")
+            return
+        await ctx.send(
+            f"Season **{label}** ended: archived {archived} matches. "
+            "Team records and ratings are kept, and the matches stay available through matchinfo and matchlog --archived."
+        )
+
+    @season_management.command(name='list')
+    async def list_seasons(self, ctx):
+        """List the archived match segments"""
+        guild_data = await self.get_guild_data(ctx.guild)
+        segments = await asyncio.get_running_loop().run_in_executor(None, lambda: guild_data.archive.segments)
+        if not segments:
+            await ctx.send("No matches have been archived yet.")
+            return
+
+        embed = discord.Embed(title="Archived Seasons", color=discord.Color.blue())
+        lines = []
+        for entry in segments[-20:]:
+            first = datetime.fromtimestamp(entry['first'], timezone.utc).strftime("%Y-%m-%d")
+            last = datetime.fromtimestamp(entry['last'], timezone.utc).strftime("%Y-%m-%d")
+            lines.append(f"**{entry['label']}** - {entry['count']} matches, {first} to {last}")
+        embed.description = "\n".join(lines)
+        if len(segments) > 20:
+            embed.set_footer(text=f"Showing the latest 20 of {len(segments)}")
+        await ctx.send(embed=embed)
+
+    @season_management.command(name='archiveafter')
+    @commands.has_permissions(administrator=True)
+    async def set_archive_after(self, ctx, days: int):
+        """Archive matches automatically once they are this many days old (0 turns it off)"""
+        if days < 0:
+            await ctx.send("Please provide a number of days that is 0 or more.")
+            return
+
+        guild_data = await self.get_guild_data(ctx.guild)
+        guild_data.archive_after_days = days or None
+        guild_data.save_config()
+        if days:
+            await ctx.send(f"Matches will be archived a calendar month at a time, once the whole month is older than {days} days.")
+        else:
+            await ctx.send("Matches will only be archived when a season ends.")
+
     @battle_management.command(name='create')
     @can_use_command_check()
     async def team_battle(self, ctx, team1: str, team2: str, *, game_name: str = "Unspecified Game"):
         """Create a team battle with team details and members"""
+        guild_data = await self.get_guild_data(ctx.guild)
         # Validate teams exist
-        if team1 not in self.teams or team2 not in self.teams:
+        team1_id = guild_data.resolve(team1)
+        team2_id = guild_data.resolve(team2)
+        if team1_id is None or team2_id is None:
             await ctx.send("One or both teams do not exist!")
             return
+        team1 = guild_data.team_name(team1_id)
+        team2 = guild_data.team_name(team2_id)
 
         # Check if user has permission to create battles
-        if not self.can_select_winner(ctx.author):
+        if not self.can_select_winner(ctx.author, guild_data):
             await ctx.send("You do not have permission to create team battles.")
             return
 
+        # A player can't fight for both sides
+        shared_members = guild_data.team_members.get(team1_id, set()) & guild_data.team_members.get(team2_id, set())
+        if shared_members:
+            mentions = ", ".join(f"<@{member_id}>" for member_id in shared_members)
+            await ctx.send(f"These players are registered on both teams: {mentions}")
+            return
+
         # Create battle embed with team details
         embed = discord.Embed(
             title="Team Battle Announcement", 
@@ -599,8 +1091,8 @@ class TeamBel(commands.Cog):
         )
         
         # Fetch team information
-        team1_info = self.teams[team1]
-        team2_info = self.teams[team2]
+        team1_info = guild_data.teams[team1_id]
+        team2_info = guild_data.teams[team2_id]
         
         # Fetch team members' mentions and IDs
         async def get_team_members(team_members):
@@ -640,17 +1132,17 @@ class TeamBel(commands.Cog):
         embed.set_thumbnail(url="https://res.cloudinary.com/dltcsc9i3/image/upload/c_thumb,w_200,g_face/v1743107009/tvt-logo-01_cqvugz.png")
         
         # Add custom battle image if set
-        if self.battle_config.get('battle_image_url'):
-            battle_image = self.battle_config['battle_image_url']
+        if guild_data.battle_config.get('battle_image_url'):
+            battle_image = guild_data.battle_config['battle_image_url']
             is_valid = await self.validate_image_url(battle_image)
             if is_valid:
                 embed.set_image(url=battle_image)
 
         # Determine where to send the battle announcement
-        if self.events_channel_id:
+        if guild_data.events_channel_id:
             # Try to send to the configured events channel
             try:
-                events_channel = ctx.guild.get_channel(self.events_channel_id)
+                events_channel = ctx.guild.get_channel(guild_data.events_channel_id)
                 if events_channel:
                     battle_message = await events_channel.send(embed=embed)
                 else:
@@ -672,174 +1164,196 @@ class TeamBel(commands.Cog):
         await battle_message.add_reaction(team2_emoji)
 
         # Store battle information with member IDs
+        created_at = time.time()
+        expiry_hours = guild_data.battle_expiry_hours
         self.active_battles[battle_message.id] = {
-            "team1": team1,
-            "team2": team2,
+            "guild_id": ctx.guild.id,
+            "channel_id": battle_message.channel.id,
+            "created_at": created_at,
+            "expires_at": created_at + expiry_hours * 3600 if expiry_hours else None,
+            "team1": team1_id,
+            "team2": team2_id,
             "team1_members": team1_member_ids,
             "team2_members": team2_member_ids,
             "game_name": game_name,
-            "battle_date": ctx.message.created_at.strftime("%B %d, %Y")
+            "battle_date": ctx.message.created_at.strftime("%B %d, %Y"),
+            "timestamp": int(ctx.message.created_at.timestamp())
         }
+        self.save_battles(ctx.guild.id)
 
     @commands.Cog.listener()
-    async def on_reaction_add(self, reaction, user):
-        """Handle team list pagination and other reactions"""
-        # Ignore bot reactions and messages not in our tracked list
-        if user.bot:
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        """Handle battle winner selection"""
+        # Works for any message, cached or not; unrelated reactions stop at this lookup
+        battle_info = self.active_battles.get(payload.message_id)
+        if not battle_info:
             return
 
-        # Check for team list pagination first
-        if hasattr(self, 'team_list_pages') and reaction.message.id in self.team_list_pages:
-            # Team list pagination logic
-            page_info = self.team_list_pages[reaction.message.id]
-            
-            try:
-                current_index = self.team_list_current_page[reaction.message.id]
-                
-                if reaction.emoji == '➡️':
-                    # Move to next page
-                    next_index = current_index + 2
-                    if next_index < len(page_info['teams']):
-                        new_embed, new_page, total_pages = page_info['create_embed'](next_index)
-                        await reaction.message.edit(embed=new_embed)
-                        self.team_list_current_page[reaction.message.id] = next_index
-                
-                elif reaction.emoji == '⬅️':
-                    # Move to previous page
-                    prev_index = max(0, current_index - 2)
-                    new_embed, new_page, total_pages = page_info['create_embed'](prev_index)
-                    await reaction.message.edit(embed=new_embed)
-                    self.team_list_current_page[reaction.message.id] = prev_index
-                
-                # Remove the user's reaction
-                await reaction.remove(user)
-            
-            except Exception as e:
-                print(f"Error in team list pagination: {e}")
-                return
+        # Ignore bot reactions
+        user = payload.member
+        if user is None or user.bot:
+            return
 
-        # Check if the reaction is on an active battle
-        battle_info = self.active_battles.get(reaction.message.id)
-        if not battle_info:
+        guild = self.bot.get_guild(payload.guild_id)
+        channel = guild.get_channel(payload.channel_id) if guild else None
+        if channel is None:
             return
 
+        guild_data = await self.get_guild_data(guild)
+
         # Ensure only authorized users can select the winner
-        if not self.can_select_winner(user) or user.bot:
-            await reaction.remove(user)
+        if not self.can_select_winner(user, guild_data):
+            try:
+                await channel.get_partial_message(payload.message_id).remove_reaction(payload.emoji, user)
+            except discord.HTTPException:
+                pass
             return
 
+        emoji = str(payload.emoji)
         # Determine winner based on reaction
-        if reaction.emoji == "🔵":
+        if emoji == "🔵":
             winner = battle_info['team1']
             loser = battle_info['team2']
-        elif reaction.emoji == "🔴":
+        elif emoji == "🔴":
             winner = battle_info['team2']
             loser = battle_info['team1']
         else:
             return
 
-        # Update team stats
-        self.teams[winner]['wins'] += 1
-        self.teams[loser]['losses'] += 1
+        # Claim the battle. Nothing awaits between here and recording the result, so
+        # of several reactions arriving together exactly one gets past this point
+        if self.active_battles.pop(payload.message_id, None) is None:
+            return  # Already resolved while we were loading or checking permissions
+        self.save_battles(guild.id)
+
+        # Battles opened before teams had IDs stored their names
+        winner = winner if winner in guild_data.teams else guild_data.resolve(winner)
+        loser = loser if loser in guild_data.teams else guild_data.resolve(loser)
+
+        # Either team may have been deleted while the battle was open
+        if winner is None or loser is None:
+            await channel.send("One of the teams in this battle no longer exists, so no result was recorded.")
+            return
 
         # Create detailed match log entry with unique ID
         match_result = {
             "match_id": str(uuid.uuid4()),  # Generate a unique ID for the match
-            "teams": [battle_info['team1'], battle_info['team2']],
+            "teams": [winner, loser] if emoji == "🔵" else [loser, winner],
             "winner": winner,
             "loser": loser,
             "team1_members": battle_info['team1_members'],
             "team2_members": battle_info['team2_members'],
             "game_name": battle_info['game_name'],
-            "battle_date": battle_info['battle_date']
+            "battle_date": battle_info['battle_date'],
+            "timestamp": battle_info.get('timestamp', int(battle_info['created_at']))
         }
 
-        # Add log to both teams
-        self.teams[battle_info['team1']]['match_log'].append(match_result)
-        self.teams[battle_info['team2']]['match_log'].append(match_result)
-        self.save_teams()
+        # Update team stats and add the log to both teams
+        guild_data.commit({"op": "match_add", "match": match_result})
 
         # Create result embed
+        winner_name = guild_data.team_name(winner)
+        loser_name = guild_data.team_name(loser)
         result_embed = discord.Embed(
             title="Team Battle Result", 
-            description=f"🏆 {winner} has defeated {loser} in {battle_info['game_name']}!", 
+            description=f"🏆 {winner_name} has defeated {loser_name} in {battle_info['game_name']}!", 
             color=discord.Color.gold()
         )
-        result_embed.add_field(name="Winner", value=winner, inline=True)
-        result_embed.add_field(name="Loser", value=loser, inline=True)
+        result_embed.add_field(name="Winner", value=winner_name, inline=True)
+        result_embed.add_field(name="Loser", value=loser_name, inline=True)
         result_embed.add_field(name="Game", value=battle_info['game_name'], inline=False)
         result_embed.set_footer(text=f"Battle winner selected by {user.name}")
 
         # Send to the same channel
-        await reaction.message.channel.send(embed=result_embed)
-
-        # Remove the active battle
-        del self.active_battles[reaction.message.id]
+        await channel.send(embed=result_embed)
 
     @team_management.command(name='matchlog')
-    async def view_match_log(self, ctx, team_name: str):
-        """View the match history for a specific team"""
-        if team_name not in self.teams:
+    async def view_match_log(self, ctx, team_name: str, *, filters: MatchLogFlags = None):
+        """View the match history for a specific team, newest first
+
+        Filter with `--opponent <team>` and `--game <game>`; add `--archived yes`
+        to include matches from past seasons.
+        """
+        guild_data = await self.get_guild_data(ctx.guild)
+        team_id = guild_data.resolve(team_name)
+        if team_id is None:
             await ctx.send(f"Team '{team_name}' not found!")
             return
-
-        match_log = self.teams[team_name]['match_log']
-        
-        if not match_log:
+        team_name = guild_data.team_name(team_id)
+
+        match_ids = guild_data.teams[team_id]['match_log']
+        matches = guild_data.matches
+        if filters and filters.archived:
+            # Decompressed on demand; archived matches come before the live log.
+            # Matches from before a stats reset are left out, as rebuild_stats does
+            history = await asyncio.get_running_loop().run_in_executor(
+                None, guild_data.archive.team_history, team_id, guild_data.teams[team_id].get('reset_at', -1)
+            )
+            match_ids = [match['match_id'] for match in history] + match_ids
+            matches = ChainMap(guild_data.matches, {match['match_id']: match for match in history})
+
+        view = MatchLogView(
+            self.paginators,
+            guild_data,
+            match_ids,
+            team_id=team_id,
+            matches=matches,
+            opponent=filters.opponent if filters else None,
+            game=filters.game if filters else None,
+        )
+        if not view.entries:
+            view.stop()
             await ctx.send(f"No match history for {team_name}.")
             return
 
-        # Create an embed for match history
-        embed = discord.Embed(
-            title=f"Match History for {team_name}", 
-            color=discord.Color.blue()
-        )
+        await view.send(ctx)
 
-        result_text = ""
-        for match in match_log:
-            # Use get() to safely access keys, with fallbacks
-            teams = match.get('teams', [])
-            winner = match.get('winner', 'Unknown')
-            loser = match.get('loser', 'Unknown')
-            game_name = match.get('game_name', 'Unspecified Game')
-            battle_date = match.get('battle_date', 'Unknown Date')
-            match_id = match.get('match_id', 'N/A')
-
-            # Determine the opposing team
-            opposing_team = teams[0] if teams and teams[0] != team_name else (teams[1] if len(teams) > 1 else 'Unknown')
-            
-            # Format the match log entry
-            result_text += f"## {team_name} vs {opposing_team}\n "
-            result_text += f"> **{game_name}** on {battle_date}\n "
-            result_text += f"> **Result:** {'🏆 Won' if winner == team_name else '💀 Lost'}\n"
-            result_text += f"> **Match ID:** `{match_id}`\n"
+    @team_management.command(name='matches')
+    async def list_matches(self, ctx, *, flags: MatchRangeFlags = None):
+        """List matches in a date range, newest first
 
-        embed.description = result_text
-        
-        await ctx.send(embed=embed)
+        Use `--since YYYY-MM-DD`, `--until YYYY-MM-DD` and optionally `--team <team>`.
+        """
+        guild_data = await self.get_guild_data(ctx.guild)
+        team_name = flags.team if flags else None
+        team_id = guild_data.resolve(team_name) if team_name else None
+        if team_name and team_id is None:
+            await ctx.send(f"Team '{team_name}' not found!")
+            return
+        team_name = guild_data.team_name(team_id) if team_id else None
+
+        try:
+            since = parse_day(flags.since) if flags and flags.since else None
+            until = parse_day(flags.until, end_of_day=True) if flags and flags.until else None
+        except ValueError:
+            await ctx.send("Dates must be written as YYYY-MM-DD.")
+            return
+
+        match_ids = guild_data.matches_between(since, until, team_id)
+        view = MatchLogView(
+            self.paginators,
+            guild_data,
+            match_ids,
+            team_id=team_id,
+            title=f"Matches for {team_name}" if team_name else "Matches",
+        )
+        if not view.entries:
+            view.stop()
+            await ctx.send("No matches found in that range.")
+            return
+
+        await view.send(ctx)
 
     @team_management.command(name='deletematch')
     @can_use_command_check()
     async def delete_match(self, ctx, match_id: str):
         """Delete a specific match from all involved teams' match logs"""
-        # Find and remove the match from all team logs
-        deleted_match = False
-        for team_name, team_data in self.teams.items():
-            # Find and remove the match with the given ID
-            team_data['match_log'] = [
-                match for match in team_data['match_log'] 
-                if match.get('match_id') != match_id
-            ]
-
-        # Determine if any matches were deleted
-        for team_name, team_data in self.teams.items():
-            if not deleted_match:
-                # Check if the match was in this team's log
-                if not any(match.get('match_id') == match_id for match in team_data['match_log']):
-                    deleted_match = True
-
-        # Save changes
-        self.save_teams()
+        guild_data = await self.get_guild_data(ctx.guild)
+        # Remove the match from the match table and both teams' logs and stats
+        deleted_match = match_id in guild_data.matches
+        if deleted_match:
+            teams = guild_data.matches[match_id]['teams']
+            guild_data.commit({"op": "match_delete", "match_id": match_id, "teams": list(teams)})
 
         # Create result embed
         if deleted_match:
@@ -860,25 +1374,25 @@ class TeamBel(commands.Cog):
     @team_management.command(name='matchinfo')
     async def view_match_details(self, ctx, match_id: str):
         """View details of a specific match by its ID"""
-        matching_matches = []
-
-        # Search for the match across all teams
-        for team_name, team_data in self.teams.items():
-            for match in team_data['match_log']:
-                if match.get('match_id') == match_id:
-                    matching_matches.append((team_name, match))
+        guild_data = await self.get_guild_data(ctx.guild)
+        match = guild_data.matches.get(match_id)
+        archived = False
+        if match is None:
+            match = await asyncio.get_running_loop().run_in_executor(None, guild_data.archive.find, match_id)
+            archived = match is not None
 
         # Create embed to show match details
-        if matching_matches:
-            match = matching_matches[0][1]  # Take the first match found
+        if match:
             embed = discord.Embed(
-                title="Match Details", 
+                title="Match Details" + (" (archived)" if archived else ""), 
                 color=discord.Color.blue()
             )
             embed.add_field(name="Match ID", value=match_id, inline=False)
-            embed.add_field(name="Teams", value=" vs ".join(match['teams']), inline=False)
-            embed.add_field(name="Winner", value=match['winner'], inline=True)
-            embed.add_field(name="Loser", value=match['loser'], inline=True)
+            winner_name = guild_data.team_name(match['winner'])
+            loser_name = guild_data.team_name(match['loser'])
+            embed.add_field(name="Teams", value=" vs ".join(guild_data.team_name(team_id) for team_id in match['teams']), inline=False)
+            embed.add_field(name="Winner", value=winner_name, inline=True)
+            embed.add_field(name="Loser", value=loser_name, inline=True)
             embed.add_field(name="Game", value=match['game_name'], inline=False)
             embed.add_field(name="Date", value=match['battle_date'], inline=False)
             
@@ -905,26 +1419,26 @@ class TeamBel(commands.Cog):
                 # Add fields with mentions
                 if winner_members:
                     embed.add_field(
-                        name=f"{match['winner']} Members", 
+                        name=f"{winner_name} Members", 
                         value="\n".join(winner_members) or "None", 
                         inline=False
                     )
                 else:
                     embed.add_field(
-                        name=f"{match['winner']} Members", 
+                        name=f"{winner_name} Members", 
                         value="No members found", 
                         inline=False
                     )
                 
                 if loser_members:
                     embed.add_field(
-                        name=f"{match['loser']} Members", 
+                        name=f"{loser_name} Members", 
                         value="\n".join(loser_members) or "None", 
                         inline=False
                     )
                 else:
                     embed.add_field(
-                        name=f"{match['loser']} Members", 
+                        name=f"{loser_name} Members", 
                         value="No members found", 
                         inline=False
                     )
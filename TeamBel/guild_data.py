@@ -0,0 +1,308 @@
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Set, Tuple
+
+from .archive import MatchArchive
+from .matchstore import MatchStore
+from .rating import DEFAULT_RATING, Leaderboard
+from .sqlstore import SqliteStore
+from .stats import STAT_FIELDS, derive_stats, empty_stats
+from .storage import BackgroundWriter, TeamJournal, apply_op, touched_teams
+
+# Storage engines a guild's teams can be kept in
+BACKENDS = ('json', 'sqlite')
+
+
+def make_store(backend: str, directory: str, writer: BackgroundWriter):
+    """Create the store for one guild directory"""
+    if backend == 'sqlite':
+        return SqliteStore(os.path.join(directory, 'teams.sqlite3'), writer)
+    return TeamJournal(
+        os.path.join(directory, 'teams.json'),
+        os.path.join(directory, 'teams.journal'),
+        writer,
+    )
+
+
+class GuildData:
+    """
+    Teams, matches and battle settings of a single guild.
+
+    Each guild lives in its own directory with its own snapshot, journal and
+    config file, so a write in one guild never touches another guild's files.
+    """
+
+    def __init__(self, guild_id: int, root: str, writer: BackgroundWriter, backend: str = 'json'):
+        self.guild_id = guild_id
+        self.directory = os.path.join(root, str(guild_id))
+        self.writer = writer
+        self.store = make_store(backend, self.directory, writer)
+        self.config_file = os.path.join(self.directory, 'config.json')
+        # Old matches, compressed and read only on demand
+        self.archive = MatchArchive(os.path.join(self.directory, 'archive'))
+        self.archive_lock = asyncio.Lock()
+        self.data = {}
+        self.teams = {}
+        self.matches = {}
+        # Casefolded team name -> team ID, and each team's entry in it
+        self.team_ids: Dict[str, str] = {}
+        self._indexed_names: Dict[str, str] = {}
+        # Membership indexes: team ID -> member IDs and member ID -> team IDs
+        self.team_members: Dict[str, Set[int]] = {}
+        self.member_teams: Dict[int, Set[str]] = {}
+        # Team IDs ordered by rating
+        self.leaderboard = Leaderboard()
+        # (timestamp, match_id) pairs sorted by time, for the guild and per team
+        self.timeline: List[Tuple[int, str]] = []
+        self.team_timelines: Dict[str, List[Tuple[int, str]]] = {}
+        self.battle_winner_roles: List[int] = []
+        self.events_channel_id: Optional[int] = None
+        self.battle_config = {}
+        self.list_page_size = 2
+        self.battle_expiry_hours: Optional[int] = None
+        # Matches older than this many days are archived automatically
+        self.archive_after_days: Optional[int] = None
+        self.last_used = time.monotonic()
+
+    def load(self):
+        """
+        Read this guild's files from disk.
+
+        Blocking and run in an executor, so it must not queue writes itself.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.data = self.store.load()
+        # Teams are keyed by an opaque ID; names are only looked up through team_ids
+        self.teams = self.data["teams"]
+        # Every match is stored once here, keyed by match_id; teams hold only the IDs.
+        # Packed into columns in memory and turned back into dicts when read
+        self.matches = self.data["matches"] = MatchStore(self.data["matches"])
+        self.archive.legacy_names = self.data.get("legacy_names", {})
+        for team_id in self.teams:
+            self._index_team(team_id)
+        self._build_timelines()
+        self.load_config()
+
+    def commit(self, op: dict):
+        """Apply a mutation to the teams data and append it to the journal"""
+        # The match is gone from self.matches once a delete is applied
+        deleted_match = self.matches.get(op["match_id"]) if op["op"] == "match_delete" else None
+        apply_op(self.data, op)
+        for team_id in touched_teams(op):
+            self._index_team(team_id)
+        self._index_times(op, deleted_match)
+        self.store.append(op, self.data)
+
+    def _build_timelines(self):
+        self.timeline = sorted((self.matches.timestamp(match_id), match_id) for match_id in self.matches)
+        self.team_timelines = {}
+        for team_id, team in self.teams.items():
+            self.team_timelines[team_id] = sorted(
+                (self.matches.timestamp(match_id), match_id)
+                for match_id in team["match_log"] if match_id in self.matches
+            )
+
+    def _index_times(self, op: dict, deleted_match: Optional[dict]):
+        """Keep the timelines in step with a journal record"""
+        kind = op["op"]
+        if kind == "batch":
+            # Batches hold roster and team records, never match deletions
+            for sub_op in op["ops"]:
+                self._index_times(sub_op, None)
+        elif kind == "match_add":
+            entry = (op["match"]["timestamp"], op["match"]["match_id"])
+            insort(self.timeline, entry)
+            for team_id in op["match"]["teams"]:
+                insort(self.team_timelines.setdefault(team_id, []), entry)
+        elif kind == "match_delete" and deleted_match is not None:
+            entry = (deleted_match["timestamp"], op["match_id"])
+            for timeline in [self.timeline] + [self.team_timelines.get(team_id, []) for team_id in deleted_match["teams"]]:
+                index = bisect_left(timeline, entry)
+                if index < len(timeline) and timeline[index] == entry:
+                    del timeline[index]
+        elif kind in ("team_delete", "log_reset"):
+            self.team_timelines.pop(op["team"], None)
+        elif kind == "match_archive":
+            # Rare and usually most of the history; cheaper to rebuild than to pick out
+            self._build_timelines()
+
+    def matches_between(self, since: Optional[int] = None, until: Optional[int] = None, team_id: Optional[str] = None) -> List[str]:
+        """IDs of matches played in [since, until], oldest first, found by bisection"""
+        timeline = self.timeline if team_id is None else self.team_timelines.get(team_id, [])
+        start = 0 if since is None else bisect_left(timeline, (since, ""))
+        # Any ID sorts before a single high code point, so `until` itself is included
+        end = len(timeline) if until is None else bisect_right(timeline, (until, "\uffff"))
+        return [match_id for _, match_id in timeline[start:end]]
+
+    def recent_record(self, team_id: str, days: int = 30) -> Tuple[int, int]:
+        """Wins and losses of a team over the last `days` days"""
+        wins = losses = 0
+        for match_id in self.matches_between(since=int(time.time()) - days * 86400, team_id=team_id):
+            if self.matches.winner(match_id) == team_id:
+                wins += 1
+            else:
+                losses += 1
+        return wins, losses
+
+    def rebuild_stats(self, archived: List[dict]) -> Dict[str, Dict[str, Tuple]]:
+        """
+        Recompute every team's stats from its match history and fix any drift.
+
+        `archived` is the archive's matches, oldest first. Returns the team IDs
+        that drifted with each wrong field's (stored, derived) values.
+        """
+        histories: Dict[str, List[dict]] = {team_id: [] for team_id in self.teams}
+        for match in archived:
+            for team_id in match["teams"]:
+                team = self.teams.get(team_id)
+                if team is not None and match.get("timestamp", 0) > team.get("reset_at", -1):
+                    histories[team_id].append(match)
+        for team_id, team in self.teams.items():
+            histories[team_id].extend(
+                self.matches[match_id] for match_id in team["match_log"] if match_id in self.matches
+            )
+
+        drift = {}
+        defaults = empty_stats()
+        for team_id, history in histories.items():
+            history.sort(key=lambda match: match.get("timestamp", 0))
+            derived = derive_stats(team_id, history)
+            team = self.teams[team_id]
+            changed = {
+                field: (team.get(field, defaults[field]), derived[field])
+                for field in STAT_FIELDS if team.get(field, defaults[field]) != derived[field]
+            }
+            if changed:
+                drift[team_id] = changed
+                self.commit({"op": "team_stats", "team": team_id, "stats": derived})
+        return drift
+
+    def _index_team(self, team_id: str):
+        """Bring the name, membership and rating indexes in line with a team's current data"""
+        for member_id in self.team_members.pop(team_id, ()):
+            member_teams = self.member_teams[member_id]
+            member_teams.discard(team_id)
+            if not member_teams:
+                del self.member_teams[member_id]
+        old_key = self._indexed_names.pop(team_id, None)
+        if old_key is not None and self.team_ids.get(old_key) == team_id:
+            del self.team_ids[old_key]
+
+        team = self.teams.get(team_id)
+        if team is None:
+            self.leaderboard.remove(team_id)
+            return
+        self.team_ids[team["name"].casefold()] = team_id
+        self._indexed_names[team_id] = team["name"].casefold()
+        self.leaderboard.update(team_id, team.get("rating", DEFAULT_RATING), team["name"])
+        members = set(team["members"])
+        self.team_members[team_id] = members
+        for member_id in members:
+            self.member_teams.setdefault(member_id, set()).add(team_id)
+
+    def resolve(self, team_name: str) -> Optional[str]:
+        """ID of the team with this name, ignoring case, or None"""
+        return self.team_ids.get(team_name.casefold())
+
+    def team_name(self, team_id: str) -> str:
+        """Display name of a team, including teams that have since been deleted"""
+        team = self.teams.get(team_id)
+        if team is not None:
+            return team["name"]
+        return self.data.get("retired", {}).get(team_id, team_id)
+
+    def is_member(self, team_id: str, member_id: int) -> bool:
+        return member_id in self.team_members.get(team_id, ())
+
+    def teams_of(self, member_id: int) -> Set[str]:
+        """IDs of every team the member is on"""
+        return self.member_teams.get(member_id, set())
+
+    def unload(self):
+        """Prepare for being dropped from memory"""
+        # Fold the journal so the next load is a single snapshot read
+        if self.store.pending:
+            self.store.compact()
+        self.store.close()
+
+    def load_config(self):
+        """Load battle configuration"""
+        if os.path.exists(self.config_file):
+            try:
+                with open(self.config_file, 'r') as f:
+                    config = json.load(f)
+                    self.battle_winner_roles = config.get('battle_winner_roles', [])
+                    self.events_channel_id = config.get('events_channel_id')
+                    self.list_page_size = config.get('list_page_size', 2)
+                    self.battle_expiry_hours = config.get('battle_expiry_hours')
+                    self.archive_after_days = config.get('archive_after_days')
+
+                    # Load battle image URL if exists
+                    self.battle_config = {
+                        'battle_image_url': config.get('battle_image_url')
+                    }
+            except json.JSONDecodeError:
+                pass  # Keep the defaults; the next change rewrites the file
+
+    def save_config(self):
+        """Queue the battle configuration to be saved in the background"""
+        self.writer.replace_json(self.config_file, {
+            'battle_winner_roles': list(self.battle_winner_roles),
+            'events_channel_id': self.events_channel_id,
+            'battle_image_url': self.battle_config.get('battle_image_url'),
+            'list_page_size': self.list_page_size,
+            'battle_expiry_hours': self.battle_expiry_hours,
+            'archive_after_days': self.archive_after_days,
+        })
+
+
+def import_legacy(teams_file: str, journal_file: str, config_file: str, guild: GuildData) -> int:
+    """
+    Copy the old process-wide data files into a guild's partition.
+
+    Blocking; run it in an executor after flushing the writer. Returns the
+    number of imported teams.
+    """
+    legacy = TeamJournal(teams_file, journal_file, guild.writer)
+    data = legacy.load()
+
+    os.makedirs(guild.directory, exist_ok=True)
+    guild.store.replace(data)
+    if isinstance(guild.store, SqliteStore):
+        guild.store.close_connection()
+    if os.path.exists(config_file):
+        os.replace(config_file, guild.config_file)
+
+    # Keep the originals around, but make sure they are never imported twice
+    for path in (teams_file, journal_file):
+        if os.path.exists(path):
+            os.replace(path, f"{path}.imported")
+    return len(data["teams"])
+
+
+def convert_backend(root: str, old: str, new: str, writer: BackgroundWriter) -> int:
+    """
+    Copy every guild's data from one storage engine to another.
+
+    Blocking; run it in an executor after flushing the writer and dropping all
+    loaded guilds. Returns the number of converted guilds.
+    """
+    if not os.path.isdir(root):
+        return 0
+
+    converted = 0
+    for entry in os.listdir(root):
+        directory = os.path.join(root, entry)
+        if not entry.isdigit() or not os.path.isdir(directory):
+            continue
+        source = make_store(old, directory, writer)
+        target = make_store(new, directory, writer)
+        target.replace(source.load())
+        for store in (source, target):
+            if isinstance(store, SqliteStore):
+                store.close_connection()
+        converted += 1
+    return converted
@@ -0,0 +1,173 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import aiohttp
+
+# Bytes read from the start of a file to recognise its format
+SNIFF_BYTES = 512
+
+# Images larger than this are rejected without being downloaded
+MAX_IMAGE_BYTES = 8 * 1024 * 1024
+
+CONTENT_RANGE_TOTAL = re.compile(r"/(\d+)$")
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Detect an image format from the first bytes of a file"""
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    if header[:2] == b'BM' and len(header) >= 14:
+        return 'bmp'
+    return None
+
+
+def declared_size(response) -> Optional[int]:
+    """Total size of the resource as announced by the response headers"""
+    if response.status == 206:
+        match = CONTENT_RANGE_TOTAL.search(response.headers.get('Content-Range', ''))
+        return int(match.group(1)) if match else None
+    return response.content_length
+
+
+class CachedResult:
+    __slots__ = ("valid", "expires_at", "etag", "last_modified")
+
+    def __init__(self, valid: bool, expires_at: float, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.valid = valid
+        self.expires_at = expires_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class ImageValidator:
+    """
+    Checks whether URLs point at images, reusing one pooled HTTP session.
+
+    Results are kept in a bounded LRU cache. Valid images are trusted for `ttl`
+    seconds and then revalidated with ETag/Last-Modified, failures are cached
+    for the shorter `negative_ttl`.
+
+    Only the first SNIFF_BYTES of a file are ever read, so memory per check stays
+    bounded no matter how large the target is.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 3600,
+        negative_ttl: float = 300,
+        timeout: float = 10,
+        max_size: int = MAX_IMAGE_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._cache: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300),
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def validate(self, url: str) -> bool:
+        """Return True if `url` points at a supported image"""
+        cached = self._cache.get(url)
+        if cached is not None and cached.expires_at > time.monotonic():
+            self._cache.move_to_end(url)
+            return cached.valid
+
+        # Share one request between callers asking about the same URL at once
+        inflight = self._inflight.get(url)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[url] = future
+        try:
+            result = await self._fetch(url, cached)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[url]
+
+        self._store(url, result)
+        future.set_result(result.valid)
+        return result.valid
+
+    async def _fetch(self, url: str, cached: Optional[CachedResult]) -> CachedResult:
+        # Servers that support ranges only send the header bytes we need
+        headers = {'Range': f'bytes=0-{SNIFF_BYTES - 1}'}
+        if cached is not None and cached.valid:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+        try:
+            async with self._get_session().get(url, headers=headers) as response:
+                if response.status == 304 and cached is not None:
+                    # Unchanged since the last check
+                    return CachedResult(True, time.monotonic() + self.ttl, cached.etag, cached.last_modified)
+                if response.status not in (200, 206):
+                    return self._failure()
+
+                # Reject on headers alone where we can
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if content_type and not content_type.startswith('image/') and content_type != 'application/octet-stream':
+                    return self._failure()
+                size = declared_size(response)
+                if size is not None and size > self.max_size:
+                    return self._failure()
+
+                # Read just enough of the body to see the file signature
+                header = b''
+                while len(header) < SNIFF_BYTES:
+                    chunk = await response.content.read(SNIFF_BYTES - len(header))
+                    if not chunk:
+                        break
+                    header += chunk
+
+                if sniff_image_type(header) is None:
+                    return self._failure()
+
+                return CachedResult(
+                    True,
+                    time.monotonic() + self.ttl,
+                    response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'),
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return self._failure()
+
+    def _failure(self) -> CachedResult:
+        return CachedResult(False, time.monotonic() + self.negative_ttl)
+
+    def _store(self, url: str, result: CachedResult):
+        self._cache[url] = result
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
@@ -0,0 +1,208 @@
+import uuid
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Union
+
+# How battle dates are displayed; stored only when they differ from the timestamp's
+DATE_FORMAT = "%B %d, %Y"
+
+# Keys every match has; anything else is kept in a per-match side dict
+STANDARD_FIELDS = frozenset((
+    "match_id", "teams", "winner", "loser", "team1_members", "team2_members",
+    "game_name", "battle_date", "timestamp", "rating_change",
+))
+
+
+class Catalog:
+    """Interns repeated strings such as team IDs and game names as small integers"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def __len__(self):
+        return len(self.values)
+
+
+def pack_id(match_id: str) -> Union[bytes, str]:
+    """16 raw bytes for a canonical UUID string, otherwise the string itself"""
+    if len(match_id) == 36:
+        try:
+            packed = uuid.UUID(match_id)
+        except ValueError:
+            return match_id
+        if str(packed) == match_id:
+            return packed.bytes
+    return match_id
+
+
+def unpack_id(key: Union[bytes, str]) -> str:
+    return str(uuid.UUID(bytes=key)) if isinstance(key, bytes) else key
+
+
+def display_date(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(DATE_FORMAT)
+
+
+class MatchStore(MutableMapping):
+    """
+    Matches kept in typed columns instead of one dict per match.
+
+    Team IDs and game names are interned in catalogs and stored as integers,
+    timestamps and rating changes live in arrays, and each match's two rosters
+    share one array('Q'). Reading a match builds the usual dict, so callers
+    see the same JSON shape that is stored on disk. Rows of deleted matches
+    are reused.
+    """
+
+    def __init__(self, matches: Optional[Dict[str, dict]] = None):
+        self.teams = Catalog()
+        self.games = Catalog()
+        # Match ID (packed) -> row in the columns below
+        self._rows: Dict[Union[bytes, str], int] = {}
+        self._free: List[int] = []
+        self._timestamp = array('q')
+        self._rating_change = array('i')
+        self._team1 = array('I')
+        self._team2 = array('I')
+        # 0 when the first team won, 1 when the second did
+        self._winner = array('B')
+        self._game = array('I')
+        # Both rosters in one array, and where the second one starts
+        self._members: List[Optional[array]] = []
+        self._split = array('H')
+        # Row -> fields that don't fit the columns, such as a custom battle date
+        self._extra: Dict[int, dict] = {}
+        # Row -> matches too irregular for the columns, stored as they came
+        self._raw: Dict[int, dict] = {}
+        if matches:
+            for match_id, match in matches.items():
+                self[match_id] = match
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._rows:
+            yield unpack_id(key)
+
+    def __contains__(self, match_id) -> bool:
+        return isinstance(match_id, str) and pack_id(match_id) in self._rows
+
+    def __getitem__(self, match_id: str) -> dict:
+        row = self._rows[pack_id(match_id)] if isinstance(match_id, str) else None
+        if row is None:
+            raise KeyError(match_id)
+        if row in self._raw:
+            return dict(self._raw[row])
+
+        team_ids = [self.teams.values[self._team1[row]], self.teams.values[self._team2[row]]]
+        winner = self._winner[row]
+        match = {
+            "match_id": match_id,
+            "teams": team_ids,
+            "winner": team_ids[winner],
+            "loser": team_ids[1 - winner],
+        }
+        members = self._members[row]
+        if members is not None:
+            split = self._split[row]
+            match["team1_members"] = members[:split].tolist()
+            match["team2_members"] = members[split:].tolist()
+        match["game_name"] = self.games.values[self._game[row]]
+        match["battle_date"] = display_date(self._timestamp[row])
+        match["timestamp"] = self._timestamp[row]
+        match["rating_change"] = self._rating_change[row]
+        match.update(self._extra.get(row, ()))
+        return match
+
+    def __setitem__(self, match_id: str, match: dict):
+        key = pack_id(match_id)
+        row = self._rows.get(key)
+        if row is None:
+            row = self._free.pop() if self._free else self._grow()
+            self._rows[key] = row
+        self._extra.pop(row, None)
+        self._raw.pop(row, None)
+        if not self._fits(match):
+            self._raw[row] = dict(match)
+            self._members[row] = None
+            return
+
+        teams = match["teams"]
+        self._team1[row] = self.teams.intern(teams[0])
+        self._team2[row] = self.teams.intern(teams[1])
+        self._winner[row] = 0 if match["winner"] == teams[0] else 1
+        self._game[row] = self.games.intern(match["game_name"])
+        self._timestamp[row] = match["timestamp"]
+        self._rating_change[row] = match.get("rating_change", 0)
+        if "team1_members" in match:
+            self._members[row] = array('Q', match["team1_members"] + match["team2_members"])
+            self._split[row] = len(match["team1_members"])
+        else:
+            self._members[row] = None
+
+        extra = {field: value for field, value in match.items() if field not in STANDARD_FIELDS}
+        if match["battle_date"] != display_date(match["timestamp"]):
+            extra["battle_date"] = match["battle_date"]
+        if extra:
+            self._extra[row] = extra
+
+    def __delitem__(self, match_id: str):
+        row = self._rows.pop(pack_id(match_id))
+        self._members[row] = None
+        self._extra.pop(row, None)
+        self._raw.pop(row, None)
+        self._free.append(row)
+
+    def _grow(self) -> int:
+        for column in (self._timestamp, self._rating_change, self._team1, self._team2, self._winner, self._game, self._split):
+            column.append(0)
+        self._members.append(None)
+        return len(self._members) - 1
+
+    @staticmethod
+    def _fits(match: dict) -> bool:
+        """Whether a match has the regular shape the columns can hold"""
+        teams = match.get("teams")
+        if not isinstance(teams, list) or len(teams) != 2 or teams[0] == teams[1]:
+            return False
+        if match.get("winner") not in teams or match.get("loser") not in teams or match["winner"] == match["loser"]:
+            return False
+        if not isinstance(match.get("game_name"), str) or not isinstance(match.get("battle_date"), str):
+            return False
+        if not isinstance(match.get("timestamp"), int) or not -2 ** 63 <= match["timestamp"] < 2 ** 63:
+            return False
+        if not -2 ** 31 <= match.get("rating_change", 0) < 2 ** 31:
+            return False
+        if ("team1_members" in match) != ("team2_members" in match):
+            return False
+        if "team1_members" in match:
+            members = match["team1_members"] + match["team2_members"]
+            if len(match["team1_members"]) > 0xFFFF or not all(isinstance(m, int) and 0 <= m < 2 ** 64 for m in members):
+                return False
+        return True
+
+    def timestamp(self, match_id: str) -> int:
+        """A match's timestamp, without building the whole match"""
+        row = self._rows[pack_id(match_id)]
+        return self._raw[row]["timestamp"] if row in self._raw else self._timestamp[row]
+
+    def winner(self, match_id: str) -> str:
+        """ID of the team that won a match, without building the whole match"""
+        row = self._rows[pack_id(match_id)]
+        if row in self._raw:
+            return self._raw[row]["winner"]
+        return self.teams.values[(self._team2 if self._winner[row] else self._team1)[row]]
+
+    def export(self) -> Dict[str, dict]:
+        """Every match as a plain dict, in the layout written to disk"""
+        return {match_id: self[match_id] for match_id in self}
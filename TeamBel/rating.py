@@ -0,0 +1,57 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+
+DEFAULT_RATING = 1000
+K_FACTOR = 32
+
+
+def elo_change(winner_rating: float, loser_rating: float) -> int:
+    """Points the winner gains and the loser loses for one battle"""
+    expected = 1 / (1 + 10 ** ((loser_rating - winner_rating) / 400))
+    return round(K_FACTOR * (1 - expected))
+
+
+def format_streak(streak: int) -> str:
+    if streak > 0:
+        return f"W{streak}"
+    if streak < 0:
+        return f"L{-streak}"
+    return "-"
+
+
+class Leaderboard:
+    """
+    Team IDs kept sorted by rating, then name.
+
+    Updating one team is a binary search plus a list insert instead of a full
+    re-sort, and pages are plain slices.
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[float, str, str]] = []
+        self._keys: Dict[str, Tuple[float, str, str]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, team_id: str, rating: float, name: str):
+        key = (-rating, name.casefold(), team_id)
+        old_key = self._keys.get(team_id)
+        if old_key == key:
+            return
+        if old_key is not None:
+            del self._entries[bisect_left(self._entries, old_key)]
+        insort(self._entries, key)
+        self._keys[team_id] = key
+
+    def remove(self, team_id: str):
+        old_key = self._keys.pop(team_id, None)
+        if old_key is not None:
+            del self._entries[bisect_left(self._entries, old_key)]
+
+    def rank(self, team_id: str) -> int:
+        """1-based position of a team"""
+        return bisect_left(self._entries, self._keys[team_id]) + 1
+
+    def page(self, start: int, count: int) -> List[str]:
+        return [team_id for _, _, team_id in self._entries[start:start + count]]
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Largest roster attachment `team import` reads
+MAX_ROSTER_BYTES = 1024 * 1024
+
+MENTION = re.compile(r"<@!?(\d+)>")
+HEADER_NAMES = ("team", "team name", "team_name")
+
+
+class RosterError(Exception):
+    """A roster file that can't be imported; `problems` lists what is wrong with it"""
+
+    def __init__(self, problems: List[str]):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+def parse_member(value) -> Optional[int]:
+    """A user ID from a number, a numeric string or a mention"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if value > 0 else None
+    text = str(value).strip()
+    mention = MENTION.fullmatch(text)
+    if mention:
+        return int(mention.group(1))
+    return int(text) if text.isdigit() else None
+
+
+def _csv_entries(text: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    # One team per row: the team name, then any number of members
+    for line, row in enumerate(csv.reader(io.StringIO(text)), 1):
+        cells = [cell.strip() for cell in row]
+        if not any(cells):
+            continue
+        if line == 1 and cells[0].casefold() in HEADER_NAMES:
+            continue
+        members = [cell for cell in cells[1:] if cell]
+        if not members:
+            yield f"Line {line}", cells[0], None
+        for member in members:
+            yield f"Line {line}", cells[0], member
+
+
+def _json_entries(text: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as error:
+        raise RosterError([f"The file is not valid JSON: {error}"])
+
+    # Either {"Team": [members]} or [{"team": "Team", "members": [...]}]
+    if isinstance(data, dict):
+        teams = list(data.items())
+    elif isinstance(data, list) and all(isinstance(entry, dict) for entry in data):
+        teams = [(entry.get("team", entry.get("name", "")), entry.get("members", [])) for entry in data]
+    else:
+        raise RosterError(['Use {"Team": [member, ...]} or [{"team": "Team", "members": [...]}].'])
+
+    for position, (team_name, members) in enumerate(teams, 1):
+        where = f"Team {position}"
+        if not isinstance(members, list):
+            raise RosterError([f"{where}: members must be a list."])
+        if not members:
+            yield where, team_name, None
+        for member in members:
+            yield where, team_name, member
+
+
+def parse_roster(filename: str, content: bytes) -> Dict[str, List[int]]:
+    """Team name -> member IDs from a CSV or JSON roster file"""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise RosterError(["The file is not UTF-8 text."])
+
+    if filename.lower().endswith(".json"):
+        entries = _json_entries(text)
+    elif filename.lower().endswith((".csv", ".txt")):
+        entries = _csv_entries(text)
+    else:
+        raise RosterError(["Attach a .csv or .json file."])
+
+    rosters: Dict[str, List[int]] = {}
+    # Team names are matched case-insensitively; the first spelling wins
+    names: Dict[str, str] = {}
+    problems = []
+    for where, team_name, member in entries:
+        team_name = str(team_name).strip()
+        if not team_name:
+            problems.append(f"{where}: missing team name")
+            continue
+        members = rosters.setdefault(names.setdefault(team_name.casefold(), team_name), [])
+        if member is None:
+            continue
+        member_id = parse_member(member)
+        if member_id is None:
+            problems.append(f"{where}: '{member}' is not a user ID or mention")
+        elif member_id not in members:
+            members.append(member_id)
+
+    if problems:
+        raise RosterError(problems)
+    if not rosters:
+        raise RosterError(["The roster is empty."])
+    return rosters
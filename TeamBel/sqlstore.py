@@ -0,0 +1,222 @@
+import json
+import sqlite3
+
+from .storage import BackgroundWriter, DATA_VERSION, migrate, touched_teams
+
+TEAMS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS teams (
+    team_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_teams_name ON teams (name COLLATE NOCASE);
+"""
+
+SCHEMA = TEAMS_SCHEMA + """
+CREATE TABLE IF NOT EXISTS memberships (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    team TEXT NOT NULL,
+    member_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_memberships_team ON memberships (team);
+CREATE INDEX IF NOT EXISTS idx_memberships_member ON memberships (member_id);
+CREATE TABLE IF NOT EXISTS matches (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    match_id TEXT NOT NULL UNIQUE,
+    battle_date TEXT,
+    timestamp INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_matches_date ON matches (battle_date);
+CREATE INDEX IF NOT EXISTS idx_matches_timestamp ON matches (timestamp);
+CREATE TABLE IF NOT EXISTS team_matches (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    team TEXT NOT NULL,
+    match_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_team_matches_team ON team_matches (team);
+CREATE INDEX IF NOT EXISTS idx_team_matches_match ON team_matches (match_id);
+CREATE TABLE IF NOT EXISTS retired_teams (
+    team_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS legacy_names (
+    name TEXT PRIMARY KEY,
+    team_id TEXT NOT NULL
+);
+"""
+
+
+def team_row(team: dict) -> str:
+    """Everything about a team except its roster and match log, as JSON"""
+    return json.dumps({key: value for key, value in team.items() if key not in ("members", "match_log")})
+
+
+class SqliteStore:
+    """
+    Stores a guild's teams in an SQLite database instead of JSON files.
+
+    Teams, memberships, matches and each team's match references get their own
+    indexed tables, and every batch of mutations becomes one small transaction
+    instead of a file rewrite. Exposes the same interface as TeamJournal.
+    """
+
+    def __init__(self, database_file: str, writer: BackgroundWriter):
+        self.database_file = database_file
+        self.writer = writer
+        self.compact_every = 0
+        self.pending = 0  # SQLite never needs compacting
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # Only ever used from the writer's executor or a blocking load, one at a time
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.database_file, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(matches)")]
+            if columns and "timestamp" not in columns:
+                # Databases from before matches had timestamps
+                self._connection.execute("ALTER TABLE matches ADD COLUMN timestamp INTEGER")
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self):
+        """Queue closing the connection once everything before it is written"""
+        self.writer.call(f"close:{id(self)}", self.close_connection)
+
+    def close_connection(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _keyed_by_name(self) -> bool:
+        """Whether the teams table is still from before teams had IDs"""
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(teams)")]
+        return "team_id" not in columns
+
+    def load(self) -> dict:
+        """Read the guild's data back into the in-memory layout (blocking)"""
+        db = self.connection
+        # user_version is 0 for databases from before it was tracked, which held version 2 data
+        version = db.execute("PRAGMA user_version").fetchone()[0] or 2
+        data = {"version": version, "teams": {}, "matches": {}}
+        teams = data["teams"]
+        key_column = "name" if self._keyed_by_name() else "team_id"
+        for team_id, row in db.execute(f"SELECT {key_column}, data FROM teams"):
+            team = json.loads(row)
+            team["members"] = []
+            team["match_log"] = []
+            teams[team_id] = team
+        for team, member_id in db.execute("SELECT team, member_id FROM memberships ORDER BY seq"):
+            if team in teams:
+                teams[team]["members"].append(member_id)
+        for team, match_id in db.execute("SELECT team, match_id FROM team_matches ORDER BY seq"):
+            if team in teams:
+                teams[team]["match_log"].append(match_id)
+        for match_id, row in db.execute("SELECT match_id, data FROM matches ORDER BY seq"):
+            data["matches"][match_id] = json.loads(row)
+        data["retired"] = dict(db.execute("SELECT team_id, name FROM retired_teams"))
+        data["legacy_names"] = dict(db.execute("SELECT name, team_id FROM legacy_names"))
+
+        if version != DATA_VERSION:
+            data = migrate(data)
+            self.replace(data)
+        return data
+
+    def append(self, op: dict, data: dict):
+        """Queue a mutation that has already been applied to `data`"""
+        # Capture the affected rows now; the live objects keep changing after this
+        rows = {}
+        for team_id in touched_teams(op):
+            team = data["teams"].get(team_id)
+            rows[team_id] = None if team is None else (team["name"], team_row(team), list(team["members"]))
+        self.writer.batch(f"sqlite:{self.database_file}", self._write, (json.dumps(op), rows))
+
+    def compact(self):
+        pass
+
+    def _write(self, records: list):
+        # One transaction for everything the writer gathered in this window
+        with self.connection as db:
+            for op, rows in records:
+                self._apply(db, json.loads(op), rows)
+
+    @classmethod
+    def _apply(cls, db: sqlite3.Connection, op: dict, rows: dict):
+        kind = op["op"]
+        if kind == "batch":
+            # The team rows below already reflect every record in the batch
+            for sub_op in op["ops"]:
+                cls._apply(db, sub_op, {})
+        elif kind == "match_add":
+            match = op["match"]
+            db.execute(
+                "INSERT OR REPLACE INTO matches (match_id, battle_date, timestamp, data) VALUES (?, ?, ?, ?)",
+                (match["match_id"], match.get("battle_date"), match.get("timestamp"), json.dumps(match)),
+            )
+            db.executemany(
+                "INSERT INTO team_matches (team, match_id) VALUES (?, ?)",
+                [(team, match["match_id"]) for team in match["teams"]],
+            )
+        elif kind == "match_delete":
+            db.execute("DELETE FROM matches WHERE match_id = ?", (op["match_id"],))
+            db.execute("DELETE FROM team_matches WHERE match_id = ?", (op["match_id"],))
+        elif kind == "match_archive":
+            archived = [(match_id,) for match_id in op["match_ids"]]
+            db.executemany("DELETE FROM matches WHERE match_id = ?", archived)
+            db.executemany("DELETE FROM team_matches WHERE match_id = ?", archived)
+        elif kind in ("log_reset", "team_delete"):
+            db.execute("DELETE FROM team_matches WHERE team = ?", (op["team"],))
+        if kind == "team_delete" and "name" in op:
+            db.execute("INSERT OR REPLACE INTO retired_teams (team_id, name) VALUES (?, ?)", (op["team"], op["name"]))
+
+        for team_id, row in rows.items():
+            if row is None:
+                db.execute("DELETE FROM teams WHERE team_id = ?", (team_id,))
+                db.execute("DELETE FROM memberships WHERE team = ?", (team_id,))
+                continue
+            name, team_json, members = row
+            db.execute("INSERT OR REPLACE INTO teams (team_id, name, data) VALUES (?, ?, ?)", (team_id, name, team_json))
+            if kind in ("member_add", "member_remove", "team_create", "batch"):
+                db.execute("DELETE FROM memberships WHERE team = ?", (team_id,))
+                db.executemany(
+                    "INSERT INTO memberships (team, member_id) VALUES (?, ?)",
+                    [(team_id, member_id) for member_id in members],
+                )
+
+    def replace(self, data: dict):
+        """Overwrite everything stored with `data` (blocking, run it in an executor)"""
+        keyed_by_name = self._keyed_by_name()
+        with self.connection as db:
+            for table in ("teams", "memberships", "matches", "team_matches", "retired_teams", "legacy_names"):
+                db.execute(f"DELETE FROM {table}")
+            if keyed_by_name:
+                # Inside the same transaction as the rewrite, so a crash leaves the old table
+                db.execute("DROP TABLE teams")
+                for statement in TEAMS_SCHEMA.split(";"):
+                    if statement.strip():
+                        db.execute(statement)
+            for team_id, team in data["teams"].items():
+                db.execute(
+                    "INSERT INTO teams (team_id, name, data) VALUES (?, ?, ?)",
+                    (team_id, team["name"], team_row(team)),
+                )
+                db.executemany(
+                    "INSERT INTO memberships (team, member_id) VALUES (?, ?)",
+                    [(team_id, member_id) for member_id in team["members"]],
+                )
+                db.executemany(
+                    "INSERT INTO team_matches (team, match_id) VALUES (?, ?)",
+                    [(team_id, match_id) for match_id in team["match_log"]],
+                )
+            db.executemany("INSERT INTO retired_teams (team_id, name) VALUES (?, ?)", data.get("retired", {}).items())
+            db.executemany("INSERT INTO legacy_names (name, team_id) VALUES (?, ?)", data.get("legacy_names", {}).items())
+            db.executemany(
+                "INSERT INTO matches (match_id, battle_date, timestamp, data) VALUES (?, ?, ?, ?)",
+                [
+                    (match_id, match.get("battle_date"), match.get("timestamp"), json.dumps(match))
+                    for match_id, match in data["matches"].items()
+                ],
+            )
+            db.execute(f"PRAGMA user_version = {DATA_VERSION}")
@@ -0,0 +1,82 @@
+from typing import Dict, Iterable, List
+
+from .rating import DEFAULT_RATING
+
+# Team fields derived from the match history rather than set directly
+STAT_FIELDS = ("wins", "losses", "streak", "rating", "games", "opponents")
+
+# How rebuild reports the fields too large to show old and new values for
+STAT_LABELS = {"games": "per-game records", "opponents": "head-to-head records"}
+
+UNSPECIFIED_GAME = "Unspecified Game"
+
+
+def empty_stats() -> dict:
+    return {"wins": 0, "losses": 0, "streak": 0, "rating": DEFAULT_RATING, "games": {}, "opponents": {}}
+
+
+def add_result(team: dict, match: dict, won: bool):
+    """Count one more match in a team's stats"""
+    change = match.get("rating_change", 0)
+    # Game name -> [wins, losses], and opponent team ID -> [wins, losses]
+    record = team.setdefault("games", {}).setdefault(match.get("game_name", UNSPECIFIED_GAME), [0, 0])
+    head_to_head = team.setdefault("opponents", {}).setdefault(match["loser"] if won else match["winner"], [0, 0])
+    if won:
+        team["wins"] += 1
+        record[0] += 1
+        head_to_head[0] += 1
+        team["rating"] = team.get("rating", DEFAULT_RATING) + change
+        team["streak"] = max(team.get("streak", 0), 0) + 1
+    else:
+        team["losses"] += 1
+        record[1] += 1
+        head_to_head[1] += 1
+        team["rating"] = team.get("rating", DEFAULT_RATING) - change
+        team["streak"] = min(team.get("streak", 0), 0) - 1
+
+
+def remove_result(team: dict, match: dict, won: bool):
+    """Take a match back out of a team's stats; the streak is left to the caller"""
+    change = match.get("rating_change", 0)
+    games = team.setdefault("games", {})
+    game_name = match.get("game_name", UNSPECIFIED_GAME)
+    record = games.get(game_name, [0, 0])
+    opponents = team.setdefault("opponents", {})
+    opponent = match["loser"] if won else match["winner"]
+    head_to_head = opponents.get(opponent, [0, 0])
+    if won:
+        team["wins"] -= 1
+        record[0] -= 1
+        head_to_head[0] -= 1
+        team["rating"] = team.get("rating", DEFAULT_RATING) - change
+    else:
+        team["losses"] -= 1
+        record[1] -= 1
+        head_to_head[1] -= 1
+        team["rating"] = team.get("rating", DEFAULT_RATING) + change
+    if record[0] <= 0 and record[1] <= 0:
+        games.pop(game_name, None)
+    if head_to_head[0] <= 0 and head_to_head[1] <= 0:
+        opponents.pop(opponent, None)
+
+
+def current_streak(team_id: str, match_ids: List[str], matches: Dict[str, dict]) -> int:
+    """Positive run of wins or negative run of losses at the end of a match log"""
+    streak = 0
+    for match_id in reversed(match_ids):
+        match = matches.get(match_id)
+        if match is None:
+            continue
+        won = match["winner"] == team_id
+        if streak and (streak > 0) != won:
+            break
+        streak += 1 if won else -1
+    return streak
+
+
+def derive_stats(team_id: str, history: Iterable[dict]) -> dict:
+    """A team's stats computed from its matches, oldest first"""
+    stats = empty_stats()
+    for match in history:
+        add_result(stats, match, match["winner"] == team_id)
+    return stats
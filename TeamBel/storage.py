@@ -0,0 +1,446 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from .rating import DEFAULT_RATING, elo_change
+from .stats import add_result, current_streak, empty_stats, remove_result
+
+log = logging.getLogger("red.teambel.storage")
+
+
+def write_json_atomic(path: str, data, indent: Optional[int] = 4):
+    """Write JSON to a temp file and rename it over the target"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+def append_lines(path: str, lines: List[str]):
+    """Append already serialized lines to a file in one write"""
+    with open(path, 'a') as f:
+        f.write("".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# Version of the snapshot layout written by this cog
+DATA_VERSION = 4
+
+# Last layout keyed by team name; journals written against it use names too
+NAME_KEYED_VERSION = 3
+
+# How battle dates were displayed and stored before matches carried timestamps
+LEGACY_DATE_FORMAT = "%B %d, %Y"
+
+
+def empty_data() -> dict:
+    return {"version": DATA_VERSION, "teams": {}, "matches": {}, "retired": {}, "legacy_names": {}}
+
+
+def new_team_id() -> str:
+    return uuid.uuid4().hex
+
+
+def legacy_timestamp(battle_date: Optional[str]) -> int:
+    """UTC epoch seconds for a stored display date, or 0 if it can't be read"""
+    try:
+        parsed = datetime.strptime(battle_date, LEGACY_DATE_FORMAT)
+    except (TypeError, ValueError):
+        return 0
+    return int(parsed.replace(tzinfo=timezone.utc).timestamp())
+
+
+def migrate(data: dict, target: int = DATA_VERSION) -> dict:
+    """Upgrade a snapshot from an older layout to `target`"""
+    if "version" not in data:
+        # Version 1 was a bare {team_name: team} dict with full match dicts
+        # copied into the match_log of both teams
+        migrated = {"version": 2, "teams": {}, "matches": {}}
+        matches = migrated["matches"]
+        for team_name, team in data.items():
+            match_ids = []
+            for match in team.get("match_log", []):
+                match_id = match.setdefault("match_id", str(uuid.uuid4()))
+                matches.setdefault(match_id, match)
+                match_ids.append(match_id)
+            team["match_log"] = match_ids
+            migrated["teams"][team_name] = team
+        data = migrated
+
+    if data["version"] == 2 and target > 2:
+        # Matches only had a display date; back-fill an epoch timestamp from it
+        for match in data["matches"].values():
+            if "timestamp" not in match:
+                match["timestamp"] = legacy_timestamp(match.get("battle_date"))
+        data["version"] = 3
+
+    if data["version"] == 3 and target > 3:
+        data = migrate_to_team_ids(data)
+
+    return data
+
+
+def migrate_to_team_ids(data: dict) -> dict:
+    """Key teams by opaque ID instead of display name and point matches at the IDs"""
+    team_ids = {}
+    teams = {}
+    taken = set()
+    for name, team in data["teams"].items():
+        display_name = name
+        # Names are now unique regardless of case
+        suffix = 2
+        while display_name.casefold() in taken:
+            display_name = f"{name} ({suffix})"
+            suffix += 1
+        taken.add(display_name.casefold())
+        team_ids[name] = new_team_id()
+        team["name"] = display_name
+        teams[team_ids[name]] = team
+
+    retired = {}
+    for match in data["matches"].values():
+        for name in [*match["teams"], match["winner"], match["loser"]]:
+            if name not in team_ids:
+                # Deleted or renamed before teams had IDs; keep the old name resolvable
+                team_ids[name] = new_team_id()
+                retired[team_ids[name]] = name
+        match["teams"] = [team_ids[name] for name in match["teams"]]
+        match["winner"] = team_ids[match["winner"]]
+        match["loser"] = team_ids[match["loser"]]
+
+    return {
+        "version": 4,
+        "teams": teams,
+        "matches": data["matches"],
+        # Team ID -> last name of deleted teams, so their matches still read well
+        "retired": retired,
+        # Old name -> team ID, for archive segments written before the upgrade
+        "legacy_names": team_ids,
+    }
+
+
+def apply_op(data, op):
+    """Apply a single journal record to the teams data"""
+    kind = op["op"]
+    teams = data["teams"]
+
+    if kind == "team_create":
+        # A copy, so the record still reads as created when it is journaled later on
+        teams[op["team"]] = copy.deepcopy(op["data"])
+    elif kind == "team_delete":
+        # Matches stay in the match table so the opponent's history still resolves
+        team = teams.pop(op["team"], None)
+        if team is not None:
+            data.setdefault("retired", {})[op["team"]] = op.get("name", team.get("name", op["team"]))
+    elif kind == "team_set":
+        teams[op["team"]][op["field"]] = op["value"]
+    elif kind == "team_rename":
+        if "new" in op:
+            # Journals from when teams were keyed by name
+            teams[op["new"]] = teams.pop(op["team"])
+        else:
+            teams[op["team"]]["name"] = op["name"]
+    elif kind == "member_add":
+        team = teams[op["team"]]
+        # The first added member becomes Team Leader
+        if not team.get("leader"):
+            team["leader"] = op["member"]
+        team["members"].append(op["member"])
+    elif kind == "member_remove":
+        teams[op["team"]]["members"].remove(op["member"])
+    elif kind == "match_add":
+        match = op["match"]
+        winner = teams[match["winner"]]
+        loser = teams[match["loser"]]
+
+        # Recorded on the match so replaying the journal gives the same ratings
+        match.setdefault("rating_change", elo_change(
+            winner.get("rating", DEFAULT_RATING), loser.get("rating", DEFAULT_RATING)
+        ))
+        add_result(winner, match, True)
+        add_result(loser, match, False)
+
+        # Records journaled before matches carried timestamps
+        match.setdefault("timestamp", legacy_timestamp(match.get("battle_date")))
+        data["matches"][match["match_id"]] = match
+        for team_name in match["teams"]:
+            teams[team_name]["match_log"].append(match["match_id"])
+    elif kind == "match_delete":
+        match = data["matches"].pop(op["match_id"])
+        for team_id in match["teams"]:
+            team = teams.get(team_id)
+            # Teams that reset their log since no longer count the match
+            if team and op["match_id"] in team["match_log"]:
+                team["match_log"].remove(op["match_id"])
+                remove_result(team, match, match["winner"] == team_id)
+                team["streak"] = current_streak(team_id, team["match_log"], data["matches"])
+    elif kind == "log_reset":
+        team = teams[op["team"]]
+        team["match_log"] = []
+        # The team's stats start over with its history
+        team.update(empty_stats())
+        if "at" in op:
+            # Archived matches from before this no longer count either
+            team["reset_at"] = op["at"]
+    elif kind == "team_stats":
+        teams[op["team"]].update(op["stats"])
+    elif kind == "batch":
+        # Several records persisted as one, such as a whole roster import
+        for sub_op in op["ops"]:
+            apply_op(data, sub_op)
+    elif kind == "match_archive":
+        # Moved to cold storage; records and ratings still count them
+        archived = set(op["match_ids"])
+        team_names = set()
+        for match_id in op["match_ids"]:
+            match = data["matches"].pop(match_id, None)
+            if match:
+                team_names.update(match["teams"])
+        for team_name in team_names:
+            team = teams.get(team_name)
+            if team:
+                team["match_log"] = [match_id for match_id in team["match_log"] if match_id not in archived]
+    else:
+        raise ValueError(f"Unknown journal record: {kind}")
+
+
+def touched_teams(op: dict) -> List[str]:
+    """IDs of the teams whose stored row a journal record changes"""
+    kind = op["op"]
+    if kind == "match_add":
+        return list(op["match"]["teams"])
+    if kind == "match_delete":
+        # Older records don't say which teams played
+        return list(op.get("teams", []))
+    if kind == "match_archive":
+        return []
+    if kind == "batch":
+        # dict.fromkeys keeps the order while dropping repeats
+        return list(dict.fromkeys(team_id for sub_op in op["ops"] for team_id in touched_teams(sub_op)))
+    return [op["team"]]
+
+
+class BackgroundWriter:
+    """
+    Collects pending file writes and performs them off the event loop.
+
+    Writes submitted within `delay` seconds of each other are merged: appends to
+    the same file are joined into one write, and replacing the same file only
+    keeps the newest payload.
+    """
+
+    def __init__(self, delay: float = 2.0):
+        self.delay = delay
+        self._pending: Dict[tuple, list] = {}
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def append_line(self, path: str, line: str):
+        """Queue a line to be appended to `path`"""
+        job = self._pending.setdefault(("append", path), ["append", path, []])
+        job[2].append(line)
+        self._wake.set()
+
+    def replace_json(self, path: str, data):
+        """Queue `data` to atomically replace the JSON file at `path`"""
+        self._pending[("replace", path)] = ["replace", path, data]
+        self._wake.set()
+
+    def batch(self, key: str, func: Callable[[list], None], item):
+        """Queue `item`; everything queued under `key` is passed to `func` in one call"""
+        job = self._pending.setdefault(("batch", key), ["batch", func, []])
+        job[2].append(item)
+        self._wake.set()
+
+    def call(self, key: str, func: Callable[[], None]):
+        """Queue a blocking callable, run after the writes queued before it"""
+        self._pending.setdefault(("call", key), ["call", key, func])
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(self.delay)
+            try:
+                # Shielded so cancelling on unload never abandons a write half done
+                await asyncio.shield(self.flush())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Background write failed")
+
+    async def flush(self):
+        """Write everything queued so far"""
+        async with self._lock:
+            self._wake.clear()
+            jobs, self._pending = list(self._pending.values()), {}
+            if jobs:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self._write_jobs, jobs)
+
+    @staticmethod
+    def _write_jobs(jobs: list):
+        for kind, target, payload in jobs:
+            if kind == "append":
+                append_lines(target, payload)
+            elif kind == "replace":
+                write_json_atomic(target, payload)
+            elif kind == "batch":
+                target(payload)
+            else:
+                payload()
+
+    async def close(self):
+        """Stop the background task and flush whatever is still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+class TeamJournal:
+    """
+    Snapshot file plus an append-only log of team mutations.
+
+    Every mutation is appended to the journal as one JSON line. Once enough
+    records pile up the journal is folded into a fresh snapshot and truncated.
+    Both happen on the background writer, so callers never touch the disk.
+
+    Records carry increasing sequence numbers and the snapshot stores the last
+    one it includes, so replay skips records a snapshot already holds. A crash
+    between writing a snapshot and truncating the journal can't apply a
+    record twice.
+    """
+
+    def __init__(self, snapshot_file: str, journal_file: str, writer: BackgroundWriter, compact_every: int = 500):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.writer = writer
+        self.compact_every = compact_every
+        self.pending = 0  # records written since the last compaction
+        self.seq = 0  # sequence number of the last record appended
+        self.torn = False  # whether the last read of the journal hit a record cut off by a crash
+
+    def load(self) -> dict:
+        """Load the snapshot and replay the journal tail on top of it"""
+        data, self.pending, upgraded = self._replay()
+        self.seq = data.pop("journal_seq")
+        # New journal records must never follow a snapshot in an older layout,
+        # nor be appended onto a torn record where replay would never reach them
+        if upgraded or self.torn or not os.path.exists(self.snapshot_file):
+            self.replace(data)
+        return data
+
+    def _replay(self):
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, 'r') as f:
+                    data = json.load(f)
+            except json.JSONDecodeError:
+                data = empty_data()
+        elif os.path.exists(self.journal_file):
+            # Snapshots are written up front now, so a bare journal predates team IDs
+            data = {"version": NAME_KEYED_VERSION, "teams": {}, "matches": {}}
+        else:
+            data = empty_data()
+
+        # Snapshots from before sequence numbers hold none of the journal
+        folded = data.pop("journal_seq", None) if "version" in data else None
+        seq = folded or 0
+
+        # The journal is in its snapshot's layout; replay it before upgrading past names
+        version = data.get("version", 1)
+        data = migrate(data, target=max(version, NAME_KEYED_VERSION))
+        replayed = 0
+        for op in self.read_journal():
+            op_seq = op.pop("seq", None)
+            if folded is not None and (op_seq is None or op_seq <= folded):
+                # Already in the snapshot; the journal outlived a crash mid-fold
+                continue
+            if op_seq is not None:
+                seq = op_seq
+            try:
+                apply_op(data, op)
+            except (KeyError, ValueError):
+                # Skip records that no longer apply instead of losing the whole log
+                continue
+            replayed += 1
+        data = migrate(data)
+        data["journal_seq"] = seq
+        return data, replayed, version != data["version"]
+
+    def read_journal(self):
+        """Yield the records stored in the journal file"""
+        self.torn = False
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, 'r') as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    # Even if it parses, the next append would be joined onto it
+                    self.torn = True
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write; nothing after it is valid
+                    self.torn = True
+                    return
+
+    def append(self, op: dict, data: Optional[dict] = None):
+        """Queue a mutation record for the journal"""
+        # Serialize now: the record may share objects with live team data
+        self.seq += 1
+        self.writer.append_line(self.journal_file, json.dumps(dict(op, seq=self.seq), separators=(',', ':')) + "\n")
+        self.pending += 1
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    def replace(self, data: dict):
+        """Overwrite everything stored with `data` (blocking, run it in an executor)"""
+        # Cover every record on disk too, in case this store was never loaded
+        last_seq = max((op.get("seq", 0) for op in self.read_journal()), default=0)
+        self.seq = max(self.seq, last_seq)
+        write_json_atomic(self.snapshot_file, dict(data, journal_seq=self.seq))
+        open(self.journal_file, 'w').close()
+        self.pending = 0
+
+    def compact(self):
+        """Queue folding the journal into a fresh snapshot"""
+        self.writer.call(f"compact:{self.snapshot_file}", self._fold)
+        self.pending = 0
+
+    def close(self):
+        pass  # Nothing stays open between writes
+
+    def _fold(self):
+        # Runs in the writer's executor after every queued append, so the files
+        # on disk are the complete history and live data is never touched
+        data, _, _ = self._replay()
+        write_json_atomic(self.snapshot_file, data)
+
+        # Only drop the journal once the snapshot is safely in place; if this never
+        # happens, the snapshot's journal_seq makes the next load skip the records
+        open(self.journal_file, 'w').close()
@@ -0,0 +1,275 @@
+from collections import OrderedDict
+from typing import List, Mapping, Optional
+
+import discord
+
+from .rating import DEFAULT_RATING, format_streak
+
+
+class PaginatorRegistry:
+    """
+    Keeps track of live paginator views, bounded in size.
+
+    Views expire on their own after their timeout; when more than `max_views`
+    are alive the least recently used one is stopped early.
+    """
+
+    def __init__(self, max_views: int = 50):
+        self.max_views = max_views
+        self._views: "OrderedDict[int, discord.ui.View]" = OrderedDict()
+
+    def add(self, message_id: int, view: discord.ui.View):
+        self._views[message_id] = view
+        self._views.move_to_end(message_id)
+        while len(self._views) > self.max_views:
+            _, oldest = self._views.popitem(last=False)
+            oldest.stop()
+
+    def touch(self, message_id: int):
+        if message_id in self._views:
+            self._views.move_to_end(message_id)
+
+    def discard(self, message_id: int):
+        self._views.pop(message_id, None)
+
+    def stop_all(self):
+        for view in self._views.values():
+            view.stop()
+        self._views.clear()
+
+
+class PaginatorView(discord.ui.View):
+    """Previous/next buttons over a fixed number of pages"""
+
+    def __init__(self, registry: PaginatorRegistry, total_pages: int, timeout: float = 300):
+        super().__init__(timeout=timeout)
+        self.registry = registry
+        self.total_pages = total_pages
+        self.page = 0
+        self.message: Optional[discord.Message] = None
+        self._update_buttons()
+
+    def render(self) -> discord.Embed:
+        raise NotImplementedError
+
+    async def send(self, ctx) -> discord.Message:
+        """Send the first page and start tracking the message"""
+        if self.total_pages <= 1:
+            self.stop()
+            self.message = await ctx.send(embed=self.render())
+            return self.message
+        self.message = await ctx.send(embed=self.render(), view=self)
+        self.registry.add(self.message.id, self)
+        return self.message
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= self.total_pages - 1
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        self.page = max(0, min(page, self.total_pages - 1))
+        self._update_buttons()
+        self.registry.touch(interaction.message.id)
+        # A single interaction response both acknowledges the click and edits the page
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(emoji='⬅️', style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(emoji='➡️', style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
+
+    async def on_timeout(self):
+        if self.message is None:
+            return
+        self.registry.discard(self.message.id)
+        try:
+            await self.message.edit(view=None)
+        except discord.HTTPException:
+            pass
+
+
+class TeamListView(PaginatorView):
+    """Paginated `team list` output"""
+
+    def __init__(self, registry: PaginatorRegistry, teams: dict, team_ids: List[str], page_size: int):
+        self.teams = teams
+        self.team_ids = team_ids
+        self.page_size = page_size
+        super().__init__(registry, (len(team_ids) + page_size - 1) // page_size)
+
+    def render(self) -> discord.Embed:
+        embed = discord.Embed(
+            title="Team List",
+            color=discord.Color.blue()
+        )
+
+        start_index = self.page * self.page_size
+        for team_id in self.team_ids[start_index:start_index + self.page_size]:
+            team_info = self.teams.get(team_id)
+            if team_info is None:
+                # Deleted since the list was opened
+                continue
+
+            embed.add_field(
+                name=team_info['name'],
+                value=(
+                    f"**Description:** {team_info['description']}\n"
+                    f"**Wins:** {team_info['wins']}\n"
+                    f"**Losses:** {team_info['losses']}\n"
+                    f"**Members:** {len(team_info['members'])}"
+                ),
+                inline=False
+            )
+
+        # Add page info
+        embed.set_footer(text=f"Page {self.page + 1}/{self.total_pages}")
+        return embed
+
+
+class LeaderboardView(PaginatorView):
+    """Paginated `team leaderboard` output, read straight from the rating index"""
+
+    def __init__(self, registry: PaginatorRegistry, guild_data, page_size: int = 10):
+        self.guild_data = guild_data
+        self.page_size = page_size
+        super().__init__(registry, max(1, (len(guild_data.leaderboard) + page_size - 1) // page_size))
+
+    def render(self) -> discord.Embed:
+        embed = discord.Embed(
+            title="Team Leaderboard",
+            color=discord.Color.gold()
+        )
+
+        start_index = self.page * self.page_size
+        lines = []
+        for rank, team_id in enumerate(self.guild_data.leaderboard.page(start_index, self.page_size), start_index + 1):
+            team = self.guild_data.teams[team_id]
+            played = team['wins'] + team['losses']
+            win_rate = f"{team['wins'] / played:.0%}" if played else "-"
+            lines.append(
+                f"**{rank}. {team['name']}** - {team.get('rating', DEFAULT_RATING)} "
+                f"({team['wins']}W/{team['losses']}L, {win_rate}, streak {format_streak(team.get('streak', 0))})"
+            )
+
+        embed.description = "\n".join(lines) or "No teams have been created yet."
+        embed.set_footer(text=f"Page {self.page + 1}/{self.total_pages}")
+        return embed
+
+
+def opponent_of(match: dict, team_id: str) -> str:
+    """ID of the team a match was played against"""
+    teams = match.get('teams', [])
+    return teams[0] if teams and teams[0] != team_id else (teams[1] if len(teams) > 1 else 'Unknown')
+
+
+class MatchLogView(PaginatorView):
+    """
+    Newest-first pages over a list of match IDs, such as a team's match log.
+
+    The list is walked backwards lazily from a cursor, so each page only looks
+    at the matches it shows (plus those skipped by filters), however long the
+    history is. Without a `team_id` matches are shown neutrally.
+    """
+
+    def __init__(
+        self,
+        registry: PaginatorRegistry,
+        guild_data,
+        match_ids: List[str],
+        team_id: Optional[str] = None,
+        opponent: Optional[str] = None,
+        game: Optional[str] = None,
+        page_size: int = 5,
+        title: Optional[str] = None,
+        matches: Optional[Mapping[str, dict]] = None,
+    ):
+        self.guild_data = guild_data
+        # Where the IDs are looked up; defaults to the guild's live matches
+        self.matches = guild_data.matches if matches is None else matches
+        self.team_id = team_id
+        self.opponent = opponent.casefold() if opponent else None
+        self.game = game.casefold() if game else None
+        self.page_size = page_size
+        self.title = title or f"Match History for {guild_data.team_name(team_id)}"
+        # A copy: deleting a match edits the team's log in place and would shift the cursors
+        self.match_log = list(match_ids)
+        # Log position each reached page starts at, newest first
+        self.cursors = [len(self.match_log) - 1]
+        self.entries: List[dict] = []
+        super().__init__(registry, 1)
+        self._load_page(0)
+        self._update_buttons()
+
+    def _wanted(self, match: Optional[dict]) -> bool:
+        if match is None:
+            return False
+        if (
+            self.opponent and self.team_id
+            and self.guild_data.team_name(opponent_of(match, self.team_id)).casefold() != self.opponent
+        ):
+            return False
+        if self.game and match.get('game_name', '').casefold() != self.game:
+            return False
+        return True
+
+    def _next_wanted(self, position: int) -> int:
+        """Position of the next wanted match at or before `position`, or -1"""
+        while position >= 0:
+            if self._wanted(self.matches.get(self.match_log[position])):
+                return position
+            position -= 1
+        return -1
+
+    def _load_page(self, page: int):
+        position = self._next_wanted(self.cursors[page])
+        self.entries = []
+        while position >= 0 and len(self.entries) < self.page_size:
+            self.entries.append(self.matches[self.match_log[position]])
+            position = self._next_wanted(position - 1)
+
+        # `position` now points at the first match of the next page, if any
+        if position >= 0 and len(self.cursors) == page + 1:
+            self.cursors.append(position)
+        self.total_pages = len(self.cursors)
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        self.page = max(0, min(page, len(self.cursors) - 1))
+        self._load_page(self.page)
+        self._update_buttons()
+        self.registry.touch(interaction.message.id)
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    def render(self) -> discord.Embed:
+        # Create an embed for match history
+        embed = discord.Embed(
+            title=self.title,
+            color=discord.Color.blue()
+        )
+
+        result_text = ""
+        for match in self.entries:
+            # Use get() to safely access keys, with fallbacks
+            winner = match.get('winner', 'Unknown')
+            game_name = match.get('game_name', 'Unspecified Game')
+            battle_date = match.get('battle_date', 'Unknown Date')
+            match_id = match.get('match_id', 'N/A')
+
+            # Format the match log entry
+            if self.team_id:
+                team_name = self.guild_data.team_name(self.team_id)
+                result_text += f"## {team_name} vs {self.guild_data.team_name(opponent_of(match, self.team_id))}\n "
+                result_text += f"> **{game_name}** on {battle_date}\n "
+                result_text += f"> **Result:** {'🏆 Won' if winner == self.team_id else '💀 Lost'}\n"
+            else:
+                team_names = [self.guild_data.team_name(team_id) for team_id in match.get('teams', [])]
+                result_text += f"## {' vs '.join(team_names)}\n "
+                result_text += f"> **{game_name}** on {battle_date}\n "
+                result_text += f"> **Winner:** 🏆 {self.guild_data.team_name(winner)}\n"
+            result_text += f"> **Match ID:** `{match_id}`\n"
+
+        embed.description = result_text or "No matches found."
+        embed.set_footer(text=f"Page {self.page + 1}" + (" - more with ➡️" if self.page < self.total_pages - 1 else ""))
+        return embed
@@ -3,11 +3,15 @@ from redbot.core import commands
 from redbot.core.bot import Red
 from discord.ui import View, Button
 from discord.utils import get
+import asyncio
 import json
 import os
 
 CONFIG_FILE = "lfg_config.json"
 
+# Seconds to gather config changes before they are written in one go
+SAVE_DELAY = 2.0
+
 # Game thumbnails by name (case-insensitive)
 game_images = {
     "valorant": "https://1000logos.net/wp-content/uploads/2022/09/Valorant-Logo.jpg",
@@ -44,20 +48,54 @@ def load_config():
         return json.load(f)
 
 def save_config(config):
-    with open(CONFIG_FILE, "w") as f:
+    # Write to a temp file and rename so a crash mid-write can't corrupt the config
+    tmp_file = f"{CONFIG_FILE}.tmp"
+    with open(tmp_file, "w") as f:
         json.dump(config, f, indent=4)
+    os.replace(tmp_file, CONFIG_FILE)
 
 class TeamLFG(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config = load_config()
+        self._save_task = None
+        self._save_now = asyncio.Event()
+        # Set by every change, cleared when the config is copied for writing
+        self._dirty = False
+        self._closing = False
+
+    async def cog_unload(self):
+        # Write out any change still waiting for the save window
+        self._closing = True
+        if self._save_task and not self._save_task.done():
+            self._save_now.set()
+            await self._save_task
 
     def get_lfg_channel_id(self, guild_id):
         return self.config.get(str(guild_id), None)
 
     def set_lfg_channel_id(self, guild_id, channel_id):
         self.config[str(guild_id)] = channel_id
-        save_config(self.config)
+        self.schedule_save()
+
+    def schedule_save(self):
+        """Save the config in the background, merging changes made within SAVE_DELAY"""
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._delayed_save())
+
+    async def _delayed_save(self):
+        # Changes made while a write is running get another pass instead of being dropped
+        while self._dirty:
+            try:
+                await asyncio.wait_for(self._save_now.wait(), timeout=SAVE_DELAY)
+            except asyncio.TimeoutError:
+                pass
+            if not self._closing:
+                self._save_now.clear()
+            self._dirty = False
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, save_config, dict(self.config))
 
     @commands.command(name='setlfgchannel')
     @commands.has_permissions(administrator=True)
@@ -0,0 +1,200 @@
+"""
+Fire concurrent battle reactions at TeamBel and check each battle records one result.
+
+Opens a number of battles in a throwaway data directory, then delivers many
+🔵 and 🔴 reactions at once, for the same and for different battles, straight
+to the cog's on_raw_reaction_add. Every battle must end up with exactly one
+match_add and one result message, whatever order the reactions interleave in:
+
+    python scripts/teambel_battle_race.py --battles 50 --reactions 8
+
+discord.py, Red and aiohttp are replaced with inert stand-ins when they are not
+installed, so the script runs with nothing beyond the standard library.
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+from collections import Counter
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+class Inert:
+    """Stands in for any discord.py, Red or aiohttp object the cog touches at import time"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __init_subclass__(cls, **kwargs):
+        pass
+
+    def __mro_entries__(self, bases):
+        return (Inert,)
+
+    def __getattr__(self, name):
+        return Inert()
+
+    def __call__(self, *args, **kwargs):
+        # Every call the cog makes at import time builds a decorator
+        return Decorator()
+
+
+class Decorator(Inert):
+    def __call__(self, function):
+        # Keep the function, and let groups take subcommands
+        function.command = function.group = function.error = Inert()
+        return function
+
+
+def install_stand_ins():
+    for name in ("discord", "redbot", "aiohttp"):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            for module_name in (name, f"{name}.ui", f"{name}.core", f"{name}.core.bot"):
+                module = types.ModuleType(module_name)
+                module.__getattr__ = lambda attribute: Inert()
+                sys.modules[module_name] = module
+
+
+class Channel:
+    def __init__(self):
+        self.results = []
+
+    async def send(self, content=None, **kwargs):
+        # Give other reactions a chance to run while the "message" is in flight
+        await asyncio.sleep(0)
+        self.results.append(kwargs.get("embed") or content)
+
+    def get_partial_message(self, message_id):
+        return self
+
+
+class Guild:
+    def __init__(self, guild_id: int, channel: Channel):
+        self.id = guild_id
+        self.channel = channel
+
+    def get_channel(self, channel_id):
+        return self.channel
+
+
+def moderator(user_id: int):
+    return types.SimpleNamespace(
+        id=user_id, name=f"mod{user_id}", bot=False, roles=[],
+        guild_permissions=types.SimpleNamespace(administrator=True),
+    )
+
+
+async def run(battles: int, reactions: int, rounds: int, seed: int) -> int:
+    from TeamBel.core import TeamBel
+    from TeamBel.guild_data import GuildData
+
+    # Count every match_add committed, by the battle it came from
+    recorded = Counter()
+    commit = GuildData.commit
+
+    def counting_commit(guild_data, op):
+        if op["op"] == "match_add":
+            recorded[op["match"]["game_name"]] += 1
+        return commit(guild_data, op)
+
+    GuildData.commit = counting_commit
+
+    rng = random.Random(seed)
+    channel = Channel()
+    guild = Guild(1, channel)
+    bot = types.SimpleNamespace(get_guild=lambda guild_id: guild)
+    cog = TeamBel(bot)
+    await cog.cog_load()
+    handler = getattr(TeamBel.on_raw_reaction_add, "callback", TeamBel.on_raw_reaction_add)
+
+    guild_data = await cog.get_guild_data(guild)
+    team_ids = []
+    for number in range(4):
+        team_id = f"team{number}"
+        guild_data.commit({"op": "team_create", "team": team_id, "data": {
+            "name": f"Team {number}", "description": "", "members": [],
+            "wins": 0, "losses": 0, "match_log": [], "logo_url": None,
+        }})
+        team_ids.append(team_id)
+
+    failures = 0
+    for round_number in range(rounds):
+        # Every other round starts cold, so the reactions also race the guild load
+        cold = round_number % 2 == 1
+        if cold:
+            await cog.writer.flush()
+            cog.guilds.pop(guild.id).unload()
+
+        channel.results.clear()
+        recorded.clear()
+        message_ids = [round_number * battles + number + 1 for number in range(battles)]
+        for message_id in message_ids:
+            team1, team2 = rng.sample(team_ids, 2)
+            cog.active_battles[message_id] = {
+                "guild_id": guild.id, "team1": team1, "team2": team2,
+                "team1_members": [], "team2_members": [],
+                # The game name tells the recorded matches apart
+                "game_name": f"battle-{message_id}",
+                "battle_date": "", "created_at": time.time(), "timestamp": int(time.time()),
+            }
+
+        payloads = [
+            types.SimpleNamespace(
+                message_id=message_id, guild_id=guild.id, channel_id=1,
+                member=moderator(rng.randrange(1, 1000)), emoji=rng.choice("🔵🔴"),
+            )
+            for message_id in message_ids
+            for _ in range(reactions)
+        ]
+        rng.shuffle(payloads)
+        await asyncio.gather(*(handler(cog, payload) for payload in payloads))
+
+        doubled = {game: times for game, times in recorded.items() if times != 1}
+        missing = [message_id for message_id in message_ids if recorded[f"battle-{message_id}"] == 0]
+        print(f"round {round_number + 1} ({'cold' if cold else 'warm'}): {len(payloads)} reactions, "
+              f"{sum(recorded.values())} results for {battles} battles, {len(channel.results)} result messages")
+        if doubled or missing or len(channel.results) != battles or cog.active_battles:
+            failures += 1
+            print(f"  FAILED: recorded more than once {doubled}, never recorded {missing}, "
+                  f"still open {list(cog.active_battles)}")
+
+    # The stored records must agree with the number of battles resolved
+    guild_data = await cog.get_guild_data(guild)
+    total_wins = sum(team["wins"] for team in guild_data.teams.values())
+    if total_wins != battles * rounds or len(guild_data.matches) != battles * rounds:
+        failures += 1
+        print(f"FAILED: {total_wins} wins and {len(guild_data.matches)} matches stored for {battles * rounds} battles")
+    await cog.cog_unload()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--battles", type=int, default=50)
+    parser.add_argument("--reactions", type=int, default=8, help="reactions fired at each battle")
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    install_stand_ins()
+    sys.path.insert(0, REPO_ROOT)
+    with tempfile.TemporaryDirectory() as directory:
+        # The cog keeps its data relative to the working directory
+        os.chdir(directory)
+        failures = asyncio.run(run(args.battles, args.reactions, args.rounds, args.seed))
+    if failures:
+        raise SystemExit(f"{failures} check(s) failed")
+    print("Every battle recorded exactly one result.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare the memory used by TeamBel matches as plain dicts and in a MatchStore.
+
+Generates a synthetic match history, loads it the way the cog does (JSON text
+parsed into dicts), then packs it into TeamBel's MatchStore and reports the
+memory each representation holds. Needs nothing beyond the standard library:
+
+    python scripts/teambel_match_memory.py --matches 100000
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+
+MATCHSTORE_FILE = os.path.join(os.path.dirname(__file__), os.pardir, "TeamBel", "matchstore.py")
+
+GAMES = ["Valorant", "League of Legends", "Rocket League", "Overwatch 2", "Counter-Strike 2", "Dota 2"]
+
+
+def load_matchstore():
+    # Loaded by path so the cog package, and with it discord, is never imported
+    spec = importlib.util.spec_from_file_location("teambel_matchstore", MATCHSTORE_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def generate(match_count: int, team_count: int, roster_size: int, seed: int) -> str:
+    """A guild's matches as the JSON text stored on disk"""
+    rng = random.Random(seed)
+    teams = [uuid.UUID(int=rng.getrandbits(128)).hex for _ in range(team_count)]
+    rosters = {team: [rng.randrange(10 ** 17, 10 ** 19) for _ in range(roster_size)] for team in teams}
+    start = int(time.time()) - 365 * 86400
+
+    matches = {}
+    for _ in range(match_count):
+        team1, team2 = rng.sample(teams, 2)
+        winner, loser = (team1, team2) if rng.random() < 0.5 else (team2, team1)
+        timestamp = start + rng.randrange(365 * 86400)
+        match_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        matches[match_id] = {
+            "match_id": match_id,
+            "teams": [team1, team2],
+            "winner": winner,
+            "loser": loser,
+            "team1_members": rosters[team1],
+            "team2_members": rosters[team2],
+            "game_name": rng.choice(GAMES),
+            "battle_date": datetime.fromtimestamp(timestamp, timezone.utc).strftime("%B %d, %Y"),
+            "timestamp": timestamp,
+            "rating_change": rng.randrange(1, 32),
+        }
+    return json.dumps(matches)
+
+
+def measure(build):
+    """Memory still held by what `build` returns, in bytes"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--matches", type=int, default=50000)
+    parser.add_argument("--teams", type=int, default=40)
+    parser.add_argument("--roster-size", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    matchstore = load_matchstore()
+    text = generate(args.matches, args.teams, args.roster_size, args.seed)
+
+    plain, plain_bytes = measure(lambda: json.loads(text))
+    store, store_bytes = measure(lambda: matchstore.MatchStore(plain))
+
+    # Exporting has to give back exactly what was loaded
+    if store.export() != plain:
+        raise SystemExit("MatchStore export does not match the original matches")
+
+    print(f"{args.matches} matches, {args.teams} teams, {args.roster_size} players per side")
+    print(f"  dicts:      {plain_bytes / 2 ** 20:8.2f} MiB  ({plain_bytes / args.matches:6.0f} bytes per match)")
+    print(f"  MatchStore: {store_bytes / 2 ** 20:8.2f} MiB  ({store_bytes / args.matches:6.0f} bytes per match)")
+    print(f"  reduction:  {1 - store_bytes / plain_bytes:8.1%}")
+
+
+if __name__ == "__main__":
+    main()